@@ -1,8 +1,12 @@
 import os
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,6 +16,170 @@ load_dotenv()
 celery = Celery('celery_tasks') 
 celery.conf.broker_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0') # redis as broker
 celery.conf.result_backend = os.getenv('REDIS_URL', 'redis://localhost:6379/0') # backend storing results - using redis here
+# Periodic jobs: outbox drain and tag count reconciliation (run the worker with -B, or a separate `celery beat`)
+celery.conf.beat_schedule = {
+    'drain-email-outbox': {
+        'task': 'celery_tasks.drain_email_outbox',
+        'schedule': float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+    },
+    'reconcile-tag-counts': {
+        'task': 'celery_tasks.reconcile_tag_counts',
+        'schedule': float(os.getenv('TAG_COUNT_RECONCILE_INTERVAL', 3600))
+    }
+}
+
+def get_mail_config():
+    """Mail settings from the environment"""
+    return {
+        'MAIL_SERVER': os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', 587)),
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'True').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('MAIL_USERNAME'),
+        'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD'),
+        'MAIL_DEFAULT_SENDER': os.getenv('MAIL_DEFAULT_SENDER'),
+        'SMTP_POOL_SIZE': int(os.getenv('SMTP_POOL_SIZE', 2)),
+        'SMTP_IDLE_TIMEOUT': int(os.getenv('SMTP_IDLE_TIMEOUT', 60)),
+        'SMTP_KEEPALIVE_INTERVAL': int(os.getenv('SMTP_KEEPALIVE_INTERVAL', 15)),
+        'SMTP_TIMEOUT': int(os.getenv('SMTP_TIMEOUT', 30))
+    }
+
+def build_message(mail_config, recipients, subject, html_body):
+    """Build the MIME message for an HTML email"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = mail_config['MAIL_DEFAULT_SENDER']
+    msg['To'] = ', '.join(recipients) if isinstance(recipients, list) else recipients
+
+    # HTML body
+    html_part = MIMEText(html_body, 'html')
+    msg.attach(html_part)
+    return msg
+
+class SMTPConnectionPool:
+    """Authenticated SMTP sessions reused across tasks in one worker process.
+
+    Sessions idle longer than SMTP_IDLE_TIMEOUT are closed, sessions idle longer
+    than SMTP_KEEPALIVE_INTERVAL are probed with NOOP before reuse, and a send
+    that fails on a dropped session is retried once on a fresh one.
+    """
+
+    def __init__(self, mail_config):
+        self.mail_config = mail_config
+        self._idle = []  # (connection, last_used)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        config = self.mail_config
+        print(f"📧 [CELERY] Connecting to {config['MAIL_SERVER']}:{config['MAIL_PORT']}")
+        server = smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['SMTP_TIMEOUT'])
+        try:
+            if config['MAIL_USE_TLS']:
+                server.starttls()
+                print("✅ [CELERY] TLS started")
+            server.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+            print("✅ [CELERY] SMTP login successful")
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def acquire(self):
+        """Reuse a live idle session or open a new one"""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            
+            idle_for = now - last_used
+            if idle_for > self.mail_config['SMTP_IDLE_TIMEOUT']:
+                self._close(server)
+            elif idle_for > self.mail_config['SMTP_KEEPALIVE_INTERVAL'] and not self._is_alive(server):
+                server.close()
+            else:
+                return server
+        return self._connect()
+
+    def release(self, server):
+        with self._lock:
+            if len(self._idle) < self.mail_config['SMTP_POOL_SIZE']:
+                self._idle.append((server, time.monotonic()))
+                return
+        self._close(server)
+
+    @contextmanager
+    def connection(self):
+        server = self.acquire()
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            server.close()
+            raise
+        except Exception:
+            # Protocol errors (e.g. a rejected recipient) leave the session usable
+            self.release(server)
+            raise
+        else:
+            self.release(server)
+
+    def send(self, msg):
+        """Send one message, retrying once if the pooled session had dropped"""
+        try:
+            with self.connection() as server:
+                server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            with self.connection() as server:
+                server.send_message(msg)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+_smtp_pool = None
+_smtp_pool_pid = None
+
+def get_smtp_pool():
+    """SMTP pool of the current worker process (created after fork)"""
+    global _smtp_pool, _smtp_pool_pid
+    if _smtp_pool is None or _smtp_pool_pid != os.getpid():
+        _smtp_pool = SMTPConnectionPool(get_mail_config())
+        _smtp_pool_pid = os.getpid()
+    return _smtp_pool
+
+_worker_db = None
+_worker_db_pid = None
+
+def get_worker_db():
+    """MongoDB handle of the current worker process (created after fork)"""
+    global _worker_db, _worker_db_pid
+    if _worker_db is None or _worker_db_pid != os.getpid():
+        from src.config import Config
+        from src.db.models import connect_db
+        _worker_db = connect_db(Config.MONGODB_URI, Config.MONGODB_DB)
+        _worker_db_pid = os.getpid()
+    return _worker_db
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    if _smtp_pool is not None and _smtp_pool_pid == os.getpid():
+        _smtp_pool.close_all()
 
 @celery.task(name='celery_tasks.send_email')
 def send_email(recipients, subject, html_body, text_body=None):
@@ -19,47 +187,102 @@ def send_email(recipients, subject, html_body, text_body=None):
     try:
         print(f"📧 [CELERY] Starting email send to {recipients}")
         
-        # Get config from environment
-        mail_config = {
-            'MAIL_SERVER': os.getenv('MAIL_SERVER', 'smtp.gmail.com'),
-            'MAIL_PORT': int(os.getenv('MAIL_PORT', 587)),
-            'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'True').lower() == 'true',
-            'MAIL_USERNAME': os.getenv('MAIL_USERNAME'),
-            'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD'),
-            'MAIL_DEFAULT_SENDER': os.getenv('MAIL_DEFAULT_SENDER')
-        }
+        pool = get_smtp_pool()
+        mail_config = pool.mail_config
         
         # Validate required config
         if not mail_config['MAIL_USERNAME'] or not mail_config['MAIL_PASSWORD']:
             return {"status": "failed", "error": "Email configuration missing"}
         
-        # message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = mail_config['MAIL_DEFAULT_SENDER']
-        msg['To'] = ', '.join(recipients) if isinstance(recipients, list) else recipients
-
-        # HTML body
-        html_part = MIMEText(html_body, 'html')
-        msg.attach(html_part)
-
-        # Send email
-        print(f"📧 [CELERY] Connecting to {mail_config['MAIL_SERVER']}:{mail_config['MAIL_PORT']}")
-        
-        with smtplib.SMTP(mail_config['MAIL_SERVER'], mail_config['MAIL_PORT']) as server:
-            if mail_config['MAIL_USE_TLS']:
-                server.starttls()
-                print("✅ [CELERY] TLS started")
-            
-            print(f"📧 [CELERY] Logging in...")
-            server.login(mail_config['MAIL_USERNAME'], mail_config['MAIL_PASSWORD'])
-            print("✅ [CELERY] SMTP login successful")
-            
-            server.send_message(msg)
-            print(f"✅ [CELERY] Email sent successfully to {recipients}")
+        # Send email over a pooled SMTP session
+        pool.send(build_message(mail_config, recipients, subject, html_body))
+        print(f"✅ [CELERY] Email sent successfully to {recipients}")
         
         return {"status": "success", "message": "Email sent!"}
         
     except Exception as e:
         print(f"❌ [CELERY] Failed to send email: {str(e)}")
-        return {"status": "failed", "error": str(e)}
\ No newline at end of file
+        return {"status": "failed", "error": str(e)}
+
+@celery.task(name='celery_tasks.send_email_batch')
+def send_email_batch(messages):
+    """Celery task sending many emails over one SMTP session.
+
+    messages is a list of dicts with recipients, subject and html_body.
+    """
+    pool = get_smtp_pool()
+    mail_config = pool.mail_config
+    
+    if not mail_config['MAIL_USERNAME'] or not mail_config['MAIL_PASSWORD']:
+        return [{"status": "failed", "error": "Email configuration missing"} for _ in messages]
+    
+    print(f"📧 [CELERY] Sending batch of {len(messages)} emails")
+    results = []
+    server = None
+    try:
+        for message in messages:
+            msg = build_message(mail_config, message['recipients'], message['subject'], message['html_body'])
+            try:
+                if server is None:
+                    server = pool.acquire()
+                server.send_message(msg)
+                results.append({"status": "success", "message": "Email sent!"})
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                # Session dropped: reconnect and retry this message once
+                if server is not None:
+                    server.close()
+                server = None
+                try:
+                    server = pool.acquire()
+                    server.send_message(msg)
+                    results.append({"status": "success", "message": "Email sent!"})
+                except Exception as retry_error:
+                    if server is not None:
+                        server.close()
+                    server = None
+                    results.append({"status": "failed", "error": str(retry_error)})
+            except Exception as e:
+                results.append({"status": "failed", "error": str(e)})
+    finally:
+        if server is not None:
+            pool.release(server)
+    
+    sent = sum(1 for result in results if result['status'] == 'success')
+    print(f"✅ [CELERY] Batch done: {sent}/{len(messages)} emails sent")
+    return results
+
+@celery.task(name='celery_tasks.drain_email_outbox')
+def drain_email_outbox():
+    """Celery task delivering due email_outbox records over pooled SMTP sessions"""
+    from src.outbox import drain_outbox, worker_id
+    
+    pool = get_smtp_pool()
+    mail_config = pool.mail_config
+    if not mail_config['MAIL_USERNAME'] or not mail_config['MAIL_PASSWORD']:
+        return {"status": "failed", "error": "Email configuration missing"}
+    
+    def send(recipients, subject, html_body, text_body=None):
+        pool.send(build_message(mail_config, recipients, subject, html_body))
+        return True
+    
+    owner = worker_id()
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = drain_outbox(get_worker_db(), send, owner)
+        total_sent += sent
+        total_failed += failed
+        if not sent and not failed:
+            break
+    
+    if total_sent or total_failed:
+        print(f"✅ [CELERY] Outbox drained: {total_sent} sent, {total_failed} failed")
+    return {"status": "success", "sent": total_sent, "failed": total_failed}
+
+@celery.task(name='celery_tasks.reconcile_tag_counts')
+def reconcile_tag_counts():
+    """Celery task rebuilding every tag's book_count from book_tags"""
+    from src.tags.service import TagService
+    get_worker_db()
+    updated = TagService().reconcile_book_counts()
+    print(f"✅ [CELERY] Reconciled book counts for {updated} tags")
+    return {"status": "success", "updated": updated}
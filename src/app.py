@@ -1,7 +1,7 @@
 from flask import Flask, jsonify
 from flask_restx import Api
 from src.config import config
-from src.extensions import jwt, mail
+from src.extensions import jwt, mail, cache
 
 def create_app(config_name='default'):
     app = Flask(__name__)
@@ -10,11 +10,47 @@ def create_app(config_name='default'):
     # Initialize extensions
     jwt.init_app(app)
     mail.init_app(app)
+    cache.init_app(app)
+    
+    from src.auth.principals import principal_cache
+    principal_cache.init_app(app)
+    
+    from src.auth.password_pool import password_pool
+    password_pool.init_app(app)
+    
+    from src.email_executor import email_executor
+    email_executor.init_app(app)
+    
+    from src.auth.throttle import login_throttle
+    login_throttle.init_app(app)
+    
+    from src.auth.blocklist import token_blocklist
+    token_blocklist.init_app(app)
+    
+    from src.auth.jwt_callbacks import register_jwt_callbacks
+    register_jwt_callbacks(jwt)
     
     # Initialize MongoDB
     from src.db.models import init_db
     init_db(app)
     
+    # Warm the tag dictionary (needs MongoDB)
+    from src.tags.dictionary import tag_dictionary
+    tag_dictionary.init_app(app)
+    
+    # =========================
+    # Metrics Route (Admin only)
+    # =========================
+    from flask_jwt_extended import jwt_required
+    from src.auth.dependencies import RoleChecker
+    from src import metrics
+    
+    @app.route('/metrics')
+    @jwt_required()
+    @RoleChecker(['admin'])
+    def metrics_snapshot():
+        return jsonify(metrics.snapshot())
+    
     # =========================
     # Root Route - Hello Message
     # =========================
@@ -66,5 +102,9 @@ def create_app(config_name='default'):
     from src.errors import register_error_handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    from src.commands import register_commands
+    register_commands(app)
+    
     print("✅ Flask app initialized successfully")
     return app
\ No newline at end of file
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+import redis
+
+from src import metrics
+
+REVOKED_KEY_PREFIX = 'revoked_jti:'
+REVOCATION_CHANNEL = 'token_revocations'
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives, tunable false positives)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, item: str):
+        # Double hashing: derive every position from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        with self._lock:
+            for position in self._positions(item):
+                self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class TokenBlocklist:
+    """Revoked JWT IDs stored in Redis with TTLs, fronted by an in-process Bloom filter.
+
+    The Bloom filter answers the common not-revoked case without a network call;
+    possible hits are confirmed in Redis. Revocations made by other workers
+    reach this process over Redis pub/sub; a lost subscription is retried and
+    the filter reloaded once it is back. The filter is rebuilt from Redis every
+    BLOCKLIST_BLOOM_REBUILD_INTERVAL seconds so expired JTIs drop out of it.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.bloom = BloomFilter(1)
+        self.capacity = 1
+        self.retry_delay = 5
+        self.rebuild_interval = 0
+        self._pubsub_thread = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def init_app(self, app, client=None):
+        self.capacity = app.config['BLOCKLIST_BLOOM_CAPACITY']
+        self.retry_delay = app.config['BLOCKLIST_RETRY_DELAY']
+        self.rebuild_interval = app.config['BLOCKLIST_BLOOM_REBUILD_INTERVAL']
+        self.bloom = BloomFilter(self.capacity)
+        self.client = client or redis.Redis.from_url(
+            app.config['REDIS_URL'],
+            socket_timeout=app.config['CACHE_SOCKET_TIMEOUT'],
+            decode_responses=True
+        )
+        # Subscribe before loading so no revocation falls between the two
+        if app.config['BLOCKLIST_PUBSUB']:
+            self._subscribe()
+        self._load()
+        if self.rebuild_interval:
+            self._schedule(self.rebuild_interval, self._rebuild)
+
+    def _add(self, jti: str):
+        with self._lock:
+            self.bloom.add(jti)
+            if self._pending is not None:
+                self._pending.append(jti)
+
+    def _load(self) -> bool:
+        """Replace the Bloom filter with one holding every currently revoked JTI"""
+        with self._load_lock:
+            return self._load_filter()
+
+    def _load_filter(self) -> bool:
+        with self._lock:
+            self._pending = []
+        try:
+            bloom = BloomFilter(self.capacity)
+            for key in self.client.scan_iter(match=f'{REVOKED_KEY_PREFIX}*', count=1000):
+                bloom.add(_to_str(key)[len(REVOKED_KEY_PREFIX):])
+        except redis.RedisError as e:
+            logging.warning(f"Could not load token blocklist: {e}")
+            with self._lock:
+                self._pending = None
+            return False
+
+        # Keep revocations that arrived while scanning
+        with self._lock:
+            for jti in self._pending:
+                bloom.add(jti)
+            self.bloom = bloom
+            self._pending = None
+        metrics.incr('blocklist.loads')
+        return True
+
+    def _rebuild(self):
+        self._load()
+        self._schedule(self.rebuild_interval, self._rebuild)
+
+    def _schedule(self, delay: float, func):
+        timer = threading.Timer(delay, func)
+        timer.daemon = True
+        timer.start()
+
+    def _subscribe(self) -> bool:
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REVOCATION_CHANNEL: self._on_revocation})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1,
+                daemon=True,
+                exception_handler=self._on_pubsub_error
+            )
+            return True
+        except redis.RedisError as e:
+            logging.warning(f"Could not subscribe to token revocations: {e}")
+            self._schedule(self.retry_delay, self._resubscribe)
+            return False
+
+    def _on_pubsub_error(self, error, pubsub, thread):
+        logging.warning(f"Token revocation subscription lost: {error}")
+        metrics.incr('blocklist.pubsub_errors')
+        thread.stop()
+        self._schedule(self.retry_delay, self._resubscribe)
+
+    def _resubscribe(self):
+        # Revocations published while disconnected were missed, so reload after subscribing
+        if self._subscribe() and not self._load():
+            self._pubsub_thread.stop()
+            self._schedule(self.retry_delay, self._resubscribe)
+
+    def _on_revocation(self, message):
+        self._add(_to_str(message['data']))
+
+    def revoke(self, jti: str, expires_at: int):
+        """Revoke a token until it would have expired anyway"""
+        ttl = max(1, int(expires_at - time.time()))
+        self._add(jti)
+        pipe = self.client.pipeline()
+        pipe.set(f'{REVOKED_KEY_PREFIX}{jti}', 1, ex=ttl)
+        pipe.publish(REVOCATION_CHANNEL, jti)
+        pipe.execute()
+        metrics.incr('blocklist.revocations')
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self.bloom:
+            metrics.incr('blocklist.bloom_negatives')
+            return False
+        
+        metrics.incr('blocklist.redis_checks')
+        try:
+            return self.client.exists(f'{REVOKED_KEY_PREFIX}{jti}') > 0
+        except redis.RedisError as e:
+            # Fail closed: the token may well have been revoked
+            logging.warning(f"Token blocklist check failed: {e}")
+            metrics.incr('blocklist.errors')
+            return True
+
+def _to_str(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+token_blocklist = TokenBlocklist()
@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
 from src.auth.service import AuthService
 from src.errors import (
@@ -10,6 +10,18 @@ from src.errors import (
     AccountNotVerified,
 )
 
+def principal_from_claims(claims: dict, user_email: str):
+    """Build the authorization principal from JWT claims, None for tokens without them"""
+    if 'role' not in claims:
+        return None
+    return {
+        '_id': claims.get('user_uid'),
+        'email': user_email,
+        'role': claims.get('role'),
+        'is_verified': claims.get('is_verified', False),
+        'token_version': claims.get('tv', 0)
+    }
+
 class RoleChecker:
     def __init__(self, allowed_roles: list):
         self.allowed_roles = allowed_roles
@@ -21,9 +33,18 @@ class RoleChecker:
             claims = get_jwt()
             user_email = get_jwt_identity()  
             
-            # Get user from database using email
+            # Authorize from the token's claims; older tokens fall back to a lookup
             user_service = AuthService()
-            user = user_service.get_user_by_email(user_email)  
+            user = principal_from_claims(claims, user_email)
+            if user is None:
+                user = user_service.get_principal(user_email)
+            elif current_app.config['JWT_CHECK_TOKEN_VERSION']:
+                # Reject tokens minted before a role, verification or password change
+                current = user_service.get_principal(user_email)
+                if not current:
+                    return jsonify({"message": "User not found"}), 404
+                if current.get('token_version', 0) != user['token_version']:
+                    return jsonify({"message": "Token is no longer valid, please log in again"}), 401
             
             if not user:
                 return jsonify({"message": "User not found"}), 404
@@ -61,7 +82,7 @@ def admin_required(f):
         user_email = get_jwt_identity()  
         
         user_service = AuthService()
-        user = user_service.get_user_by_email(user_email) 
+        user = user_service.get_principal(user_email)
         
         if not user or user.get('role') != 'admin':
             return jsonify({"message": "Admin access required"}), 403
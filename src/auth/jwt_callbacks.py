@@ -0,0 +1,22 @@
+from src.auth.blocklist import token_blocklist
+from src.auth.service import AuthService
+
+def register_jwt_callbacks(jwt):
+    """Register flask_jwt_extended callbacks on the JWTManager"""
+
+    @jwt.additional_claims_loader
+    def add_user_claims(identity):
+        """Embed the fields RoleChecker needs so requests can be authorized from the token"""
+        principal = AuthService().get_principal(identity, fresh=True)
+        if not principal:
+            return {}
+        return {
+            'user_uid': str(principal['_id']),
+            'role': principal.get('role'),
+            'is_verified': principal.get('is_verified', False),
+            'tv': principal.get('token_version', 0)
+        }
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_blocklist.is_revoked(jwt_payload['jti'])
@@ -0,0 +1,80 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from src import metrics
+from src.errors import PasswordPoolBusy
+
+class PasswordPool:
+    """Bounded process pool for bcrypt work.
+
+    At most PASSWORD_POOL_SIZE hashes run at once and PASSWORD_POOL_QUEUE_SIZE
+    more may wait; beyond that callers get PasswordPoolBusy immediately so a
+    login burst cannot tie up every request thread. A job that outlives
+    PASSWORD_POOL_TIMEOUT is cancelled if still queued and also reported as
+    PasswordPoolBusy; its slot is only freed once it leaves the pool. Without
+    init_app (CLI, Celery) work runs inline.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.size = 0
+        self.timeout = None
+        self._executor = None
+        self._slots = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config['PASSWORD_POOL_ENABLED']
+        self.size = app.config['PASSWORD_POOL_SIZE']
+        self.timeout = app.config['PASSWORD_POOL_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.size + app.config['PASSWORD_POOL_QUEUE_SIZE'])
+        metrics.register_gauge('password_pool.in_flight', lambda: self._in_flight)
+        metrics.register_gauge('password_pool.queue_depth', self.queue_depth)
+
+    def queue_depth(self):
+        return max(0, self._in_flight - self.size)
+
+    def _get_executor(self):
+        # Created lazily so each forked web worker owns its pool. Workers come
+        # from a forkserver: forking this (threaded) process could deadlock them.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=multiprocessing.get_context('forkserver')
+                )
+            return self._executor
+
+    def run(self, func, *args):
+        if not self.enabled:
+            return func(*args)
+        
+        if not self._slots.acquire(blocking=False):
+            metrics.incr('password_pool.rejections')
+            raise PasswordPoolBusy('Too many password operations in progress, please retry shortly')
+        
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+        # The slot is held until the job leaves the executor, so its backlog stays bounded
+        future.add_done_callback(lambda _: self._release())
+        
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            metrics.incr('password_pool.timeouts')
+            raise PasswordPoolBusy('Password operation timed out, please retry shortly')
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+password_pool = PasswordPool()
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+from src import metrics
+
+# User fields needed to authorize a request
+PRINCIPAL_FIELDS = {'_id': 1, 'email': 1, 'role': 1, 'is_verified': 1, 'token_version': 1}
+
+class PrincipalCache:
+    """In-process LRU cache with a TTL for authorization principals, keyed by email.
+
+    Entries are evicted explicitly when a user is updated in this process; the
+    TTL bounds how long other workers can serve a stale role or verification flag.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: int = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config['PRINCIPAL_CACHE_SIZE']
+        self.ttl = app.config['PRINCIPAL_CACHE_TTL']
+        metrics.register_gauge('principal_cache.size', self.__len__)
+
+    def get(self, email: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None:
+                expires_at, principal = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(email)
+                    metrics.incr('principal_cache.hits')
+                    return principal
+                del self._entries[email]
+                metrics.incr('principal_cache.expired')
+        metrics.incr('principal_cache.misses')
+        return None
+
+    def set(self, email: str, principal: dict):
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.incr('principal_cache.evictions')
+
+    def evict(self, email: str = None, user_id: str = None):
+        """Drop a principal by email or by user ID"""
+        with self._lock:
+            emails = [email] if email else []
+            if user_id:
+                # Writes are rare, so a scan keeps the cache a single map
+                emails += [key for key, (_, principal) in self._entries.items()
+                           if str(principal['_id']) == user_id]
+            for key in emails:
+                if self._entries.pop(key, None) is not None:
+                    metrics.incr('principal_cache.invalidations')
+
+    def __len__(self):
+        return len(self._entries)
+
+principal_cache = PrincipalCache()
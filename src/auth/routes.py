@@ -1,32 +1,39 @@
-from flask import request
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import (
     create_access_token, 
     create_refresh_token, 
     jwt_required, 
+    decode_token,
+    get_jwt,
     get_jwt_identity
 )
 from datetime import timedelta
+from redis.exceptions import RedisError
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from src.config import Config
 from src.auth.service import AuthService
+from src.auth.blocklist import token_blocklist
+from src.auth.throttle import login_throttle
 from src.auth.schemas import (
     UserCreateSchema, UserLoginSchema, EmailSchema, 
     PasswordResetRequestSchema, PasswordResetConfirmSchema, UserSchema
 )
 from src.auth.dependencies import get_current_user, RoleChecker
-from src.errors import UserAlreadyExists, UserNotFound, InvalidCredentials
+from src.errors import UserAlreadyExists, UserNotFound, InvalidCredentials, PasswordPoolBusy
 from src.auth.utils import create_url_safe_token, decode_url_safe_token
+from src.outbox import enqueue_email
+from src.email_executor import email_executor
 
 # ========== NAMESPACE  ==========
 auth_ns = Namespace('auth', description='Authentication operations')
 
 # ========== CELERY IMPORTS ==========
 try:
-    from celery_tasks import send_email
+    from celery_tasks import drain_email_outbox
     CELERY_AVAILABLE = True
     print("✅ Celery is available for email tasks")
 except Exception as e:
@@ -56,7 +63,7 @@ def send_real_email_sync(recipients, subject, html_body, text_body=None):
         print(f"📧 [SYNC] Connecting to {Config.MAIL_SERVER}:{Config.MAIL_PORT}")
         
         # connects to smptp server
-        with smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT) as server:
+        with smtplib.SMTP(Config.MAIL_SERVER, Config.MAIL_PORT, timeout=Config.SMTP_TIMEOUT) as server:
             # turns on encryption
             if Config.MAIL_USE_TLS:
                 server.starttls()
@@ -82,19 +89,22 @@ def send_email_fallback(recipients, subject, html_body):
     print(f"📧 [FALLBACK] Using synchronous email fallback")
     return send_real_email_sync(recipients, subject, html_body)
 
-# Use celery if available, otherwise fallback
+# Emails are recorded in the outbox and delivered by a worker, so requests never wait on SMTP
 def send_email_task(recipients, subject, html_body, text_body=None):
+    outbox_id = enqueue_email(recipients, subject, html_body, text_body)
+    print(f"✅ [APP] Email {outbox_id} added to the outbox")
     if CELERY_AVAILABLE:
         try:
-            task = send_email.delay(recipients, subject, html_body, text_body)
-            print(f"✅ [APP] Email task queued with ID: {task.id}")
-            return task
+            # Nudge a worker so the email goes out before the next scheduled drain
+            drain_email_outbox.apply_async(retry=False)
+            return outbox_id
         except Exception as e:
-            print(f"❌ [APP] Celery task failed, using sync fallback: {e}")
-            return send_real_email_sync(recipients, subject, html_body, text_body)
-    else:
-        print("⚠️ [APP] Celery not available, using sync email")
-        return send_real_email_sync(recipients, subject, html_body, text_body)
+            print(f"⚠️ [APP] Could not reach Celery, sending in-process: {e}")
+    
+    # No Celery worker: deliver from this process in the background
+    if not email_executor.submit(outbox_id):
+        print("⚠️ [APP] Email executor unavailable, email stays in the outbox")
+    return outbox_id
 
 # Marshmallow schemas
 user_create_schema = UserCreateSchema()
@@ -145,6 +155,10 @@ password_reset_confirm_model = auth_ns.model('PasswordResetConfirm', {
     'confirm_new_password': fields.String(required=True, description='Confirm New Password')
 })
 
+logout_model = auth_ns.model('Logout', {
+    'refresh_token': fields.String(description='Refresh Token to revoke as well')
+})
+
 token_model = auth_ns.model('Token', {
     'access_token': fields.String(description='Access Token'),
     'refresh_token': fields.String(description='Refresh Token'),
@@ -156,6 +170,10 @@ user_service = AuthService()
 role_checker = RoleChecker(["admin", "user"])
 REFRESH_TOKEN_EXPIRY = 2  # days
 
+# fast rejection when the password hashing pool is saturated
+def password_pool_busy_response(error):
+    return {'message': str(error)}, 503, {'Retry-After': str(Config.PASSWORD_RETRY_AFTER)}
+
 # formats user respose and removes confidential info if exits
 def format_user_response(user_doc):
     """Format MongoDB document for response"""
@@ -167,7 +185,7 @@ def format_user_response(user_doc):
     del user['_id']
     
     # Remove sensitive fields
-    for field in ['password_hash', '_id', 'password']:
+    for field in ['password_hash', '_id', 'password', 'token_version']:
         if field in user:
             del user[field]
     
@@ -229,6 +247,8 @@ class Signup(Resource):
                 "verification_link": link, 
             }, 201
             
+        except PasswordPoolBusy as e:
+            return password_pool_busy_response(e)
         except Exception as e:
             return {'message': f'Error creating user: {str(e)}'}, 500
 
@@ -292,6 +312,7 @@ class Login(Resource):
     @auth_ns.response(401, 'Invalid credentials')
     @auth_ns.response(403, 'Account not verified')
     @auth_ns.response(404, 'User not found')
+    @auth_ns.response(429, 'Too many login attempts')
     @auth_ns.response(500, 'Internal server error')
     def post(self):
         """Login user"""
@@ -304,15 +325,24 @@ class Login(Resource):
         
         email = data['email']
         password = data['password']
+        
+        # Shed credential-stuffing traffic before any lookup or bcrypt work
+        retry_after = login_throttle.check(login_throttle.client_ip(), email)
+        if retry_after:
+            return {'message': 'Too many login attempts, please try again later'}, 429, {'Retry-After': str(retry_after)}
 
         try:
             user = user_service.get_user_by_email(email)
             if not user:
                 return {'message': 'User not found'}, 404
 
-            from src.auth.utils import verify_password
+            from src.auth.utils import verify_password, password_needs_rehash
             if not verify_password(password, user['password_hash']):
                 return {'message': 'Invalid credentials'}, 401
+            
+            # Move the hash to the configured bcrypt cost
+            if password_needs_rehash(user['password_hash']):
+                user_service.rehash_password_in_background(user, password)
 
             # Check if user is verified
             if not user.get('is_verified', False):
@@ -335,6 +365,8 @@ class Login(Resource):
                 "user": format_user_response(user),
             }, 200
             
+        except PasswordPoolBusy as e:
+            return password_pool_busy_response(e)
         except Exception as e:
             return {'message': f'Login error: {str(e)}'}, 500
 
@@ -352,6 +384,13 @@ class RefreshToken(Resource):
             # Get email from refresh token identity
             user_email = get_jwt_identity()
             
+            # Refresh tokens minted before a role, verification or password change are stale
+            claims = get_jwt()
+            if 'tv' in claims:
+                user = user_service.get_principal(user_email, fresh=True)
+                if not user or user.get('token_version', 0) != claims['tv']:
+                    return {'message': 'Refresh token is no longer valid, please log in again'}, 401
+            
             # Create new access token
             new_access_token = create_access_token(identity=user_email)
             
@@ -370,11 +409,36 @@ class RefreshToken(Resource):
 @auth_ns.route('/logout')
 class Logout(Resource):
     @jwt_required()
+    @auth_ns.expect(logout_model)
     @auth_ns.response(200, 'Logout successful')
+    @auth_ns.response(400, 'Invalid refresh token')
+    @auth_ns.response(503, 'Tokens could not be revoked')
     def post(self):
-        """Logout user (client should discard tokens)"""
+        """Logout user by revoking the access token (and the refresh token if provided)"""
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            claims = get_jwt()
+            token_blocklist.revoke(claims['jti'], claims['exp'])
+        except RedisError as e:
+            return {'message': f'Logout error: {str(e)}'}, 503
+        
+        if data.get('refresh_token'):
+            try:
+                refresh_claims = decode_token(data['refresh_token'])
+            except Exception:
+                return {'message': 'Invalid refresh token. The access token has been revoked.'}, 400
+            
+            # Only revoke refresh tokens that belong to the same user
+            identity_claim = current_app.config['JWT_IDENTITY_CLAIM']
+            if refresh_claims.get(identity_claim) == get_jwt_identity():
+                try:
+                    token_blocklist.revoke(refresh_claims['jti'], refresh_claims['exp'])
+                except RedisError as e:
+                    return {'message': f'Logout error: {str(e)}'}, 503
+        
         return {
-            "message": "Logout successful. Please discard your tokens."
+            "message": "Logout successful. Tokens have been revoked."
         }, 200
 
 # =========================
@@ -479,6 +543,8 @@ class PasswordResetConfirm(Resource):
             else:
                 return {'message': 'Error occurred during password reset'}, 500
                 
+        except PasswordPoolBusy as e:
+            return password_pool_busy_response(e)
         except Exception as e:
             return {'message': f'Password reset error: {str(e)}'}, 500
 
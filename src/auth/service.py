@@ -1,8 +1,18 @@
+import logging
+import threading
 from bson import ObjectId
 from datetime import datetime
-from src.db.models import get_db
+from flask import g, has_request_context
+from src.db.models import get_db, bump_collection_version
+from src.auth.principals import PRINCIPAL_FIELDS, principal_cache
 from src.auth.utils import generate_passwd_hash
 
+# User fields shown inside cached book details
+PROFILE_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+# Changing any of these invalidates the user's existing tokens
+TOKEN_VERSION_FIELDS = ('role', 'is_verified', 'password_hash')
+
 class AuthService:
     def __init__(self):
         self.db = get_db()
@@ -11,10 +21,39 @@ class AuthService:
         """Get user by email"""
         return self.db.users.find_one({'email': email})
     
+    def get_principal(self, email: str, fresh: bool = False):
+        """Get the fields needed to authorize a user (_id, email, role, is_verified, token_version).
+
+        Memoized for the current request and cached in-process with a TTL;
+        fresh=True skips the in-process cache (used when minting tokens).
+        """
+        memo = g.setdefault('principals', {}) if has_request_context() else {}
+        if email in memo:
+            return memo[email]
+        
+        principal = None if fresh else principal_cache.get(email)
+        if principal is None:
+            principal = self.db.users.find_one({'email': email}, PRINCIPAL_FIELDS)
+            if principal:
+                principal_cache.set(email, principal)
+        
+        memo[email] = principal
+        return principal
+    
     def get_user_by_id(self, user_id: str):
         """Get user by ID"""
         return self.db.users.find_one({'_id': ObjectId(user_id)})
     
+    def get_users_by_ids(self, user_ids, fields=None):
+        """Get users for many IDs in a single query, keyed by string ID (optionally only the given fields)"""
+        object_ids = list({ObjectId(uid) for uid in user_ids if uid and ObjectId.is_valid(uid)})
+        if not object_ids:
+            return {}
+        
+        projection = {field: 1 for field in fields} if fields else None
+        users = self.db.users.find({'_id': {'$in': object_ids}}, projection)
+        return {str(user['_id']): user for user in users}
+    
     def user_exists(self, email: str):
         """Check if user exists"""
         user = self.get_user_by_email(email)
@@ -46,12 +85,44 @@ class AuthService:
         """Update user data"""
         user_data['updated_at'] = datetime.utcnow()
         
-        result = self.db.users.update_one(
-            {'_id': ObjectId(user_id)},
-            {'$set': user_data}
-        )
+        update = {'$set': user_data}
+        if any(field in user_data for field in TOKEN_VERSION_FIELDS):
+            update['$inc'] = {'token_version': 1}
+        
+        result = self.db.users.update_one({'_id': ObjectId(user_id)}, update)
+        principal_cache.evict(user_id=user_id)
+        
+        # Books the user owns or reviewed embed their name: bump their versions and evict them
+        if result.modified_count > 0 and any(field in user_data for field in PROFILE_FIELDS):
+            from src.books.service import invalidate_book_cache
+            owned = [str(book['_id']) for book in self.db.books.find({'user_uid': user_id}, {'_id': 1})]
+            reviewed = self.db.reviews.distinct('book_uid', {'user_uid': user_id})
+            book_uids = set(owned) | set(reviewed)
+            if book_uids:
+                self.db.books.update_many(
+                    {'_id': {'$in': [ObjectId(uid) for uid in book_uids if ObjectId.is_valid(uid)]}},
+                    {'$inc': {'version': 1}}
+                )
+            bump_collection_version('books', 'reviews')
+            invalidate_book_cache(book_uids)
+        
         return result.modified_count > 0
     
+    def rehash_password_in_background(self, user: dict, password: str):
+        """Re-hash a password at the configured bcrypt cost without blocking the caller"""
+        def rehash():
+            try:
+                new_hash = generate_passwd_hash(password)
+                # Compare-and-set so a concurrent password reset wins; tokens stay valid
+                self.db.users.update_one(
+                    {'_id': user['_id'], 'password_hash': user['password_hash']},
+                    {'$set': {'password_hash': new_hash}}
+                )
+            except Exception as e:
+                logging.warning(f"Password rehash failed for user {user['_id']}: {e}")
+        
+        threading.Thread(target=rehash, daemon=True).start()
+    
     def verify_user(self, user_id: str):
         """Mark user as verified"""
         return self.update_user(user_id, {'is_verified': True})
\ No newline at end of file
@@ -0,0 +1,124 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from flask import request
+
+from src import metrics
+
+THROTTLE_KEY_PREFIX = 'login_throttle:'
+
+# Sliding window log: trims the window, then records the attempt only if it is
+# under the limit (and ARGV[5] asks for it). Returns 0 when allowed, otherwise
+# the timestamp of the attempt whose expiry frees a slot.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count < limit then
+    if ARGV[5] == '1' then
+        redis.call('ZADD', KEYS[1], now, ARGV[4])
+        redis.call('EXPIRE', KEYS[1], math.ceil(window))
+    end
+    return 0
+end
+local entry = redis.call('ZRANGE', KEYS[1], count - limit, count - limit, 'WITHSCORES')
+return entry[2]
+"""
+
+class LoginThrottle:
+    """Sliding-window login limits per client IP and per email.
+
+    Windows are kept in Redis sorted sets so limits hold across workers;
+    only allowed attempts are recorded, so a client that waits Retry-After
+    gets in. A local token bucket per key sits in front and rejects floods
+    without recording them in Redis; if Redis is down the local buckets still
+    apply.
+    """
+
+    def __init__(self, max_local_keys: int = 10000):
+        self.enabled = False
+        self.client = None
+        self.max_local_keys = max_local_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, client=None):
+        self.enabled = app.config['LOGIN_RATE_LIMIT_ENABLED']
+        self.window = app.config['LOGIN_RATE_WINDOW']
+        self.limits = {
+            'ip': app.config['LOGIN_IP_LIMIT'],
+            'email': app.config['LOGIN_EMAIL_LIMIT']
+        }
+        self.trusted_proxies = app.config['LOGIN_TRUSTED_PROXIES']
+        self.client = client or redis.Redis.from_url(
+            app.config['REDIS_URL'],
+            socket_timeout=app.config['CACHE_SOCKET_TIMEOUT']
+        )
+        self._sliding_window = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def client_ip(self):
+        """Client IP, read from X-Forwarded-For only when behind trusted proxies"""
+        if self.trusted_proxies and len(request.access_route) >= self.trusted_proxies:
+            return request.access_route[-self.trusted_proxies]
+        return request.remote_addr
+
+    def check(self, ip: str, email: str) -> int:
+        """Record a login attempt; returns seconds to wait if it is over a limit, else 0"""
+        if not self.enabled:
+            return 0
+        
+        for scope, value in (('ip', ip), ('email', email.lower())):
+            key = f'{scope}:{value}'
+            limit = self.limits[scope]
+            local_wait = self._take_local(key, limit)
+            # Over the local bucket: only ask Redis how long its window still holds
+            retry_after = max(local_wait, self._take_redis(key, limit, record=not local_wait))
+            if retry_after:
+                metrics.incr(f'login_throttle.rejected.{scope}')
+                return retry_after
+        return 0
+
+    def _take_local(self, key: str, limit: int) -> int:
+        """Token bucket refilled at limit per window; returns seconds to wait when empty"""
+        rate = limit / self.window
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = math.ceil((1 - tokens) / rate)
+                metrics.incr('login_throttle.local_rejections')
+            
+            while len(self._buckets) > self.max_local_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def _take_redis(self, key: str, limit: int, record: bool = True) -> int:
+        """Sliding window log in a sorted set; returns seconds to wait when over the limit"""
+        now = time.time()
+        try:
+            expires_from = self._sliding_window(
+                keys=[f'{THROTTLE_KEY_PREFIX}{key}'],
+                args=[now, self.window, limit, f'{now}:{uuid.uuid4().hex}', int(record)]
+            )
+        except redis.RedisError as e:
+            logging.warning(f"Login throttle check failed: {e}")
+            metrics.incr('login_throttle.redis_errors')
+            return 0
+        
+        if not expires_from:
+            return 0
+        return max(1, math.ceil(float(expires_from) + self.window - now))
+
+login_throttle = LoginThrottle()
@@ -1,21 +1,65 @@
 import logging
+import time
 import uuid
 from datetime import datetime, timedelta
 from itsdangerous import URLSafeTimedSerializer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
 from flask import current_app
+from src.config import Config
 
-passwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def build_passwd_context(rounds: int = None) -> CryptContext:
+    """bcrypt context; with rounds set, hashes of any other cost need an update"""
+    if not rounds:
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
 
-def generate_passwd_hash(password: str) -> str:
-    """Generates a bcrypt hash for the password."""
+passwd_context = build_passwd_context(Config.BCRYPT_ROUNDS)
+
+def _hash_password(password: str) -> str:
     return passwd_context.hash(password)
 
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verifies a password against a bcrypt hash."""
+def _verify_password(password: str, password_hash: str) -> bool:
     return passwd_context.verify(password, password_hash)
 
+def generate_passwd_hash(password: str) -> str:
+    """Generates a bcrypt hash for the password in the password pool."""
+    from src.auth.password_pool import password_pool
+    return password_pool.run(_hash_password, password)
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Verifies a password against a bcrypt hash in the password pool."""
+    from src.auth.password_pool import password_pool
+    return password_pool.run(_verify_password, password, password_hash)
+
+def password_needs_rehash(password_hash: str) -> bool:
+    """Check if a hash was made with a different bcrypt cost than configured."""
+    return passwd_context.needs_update(password_hash)
+
+def measure_bcrypt_rounds(target_ms: float, min_rounds: int = 4, max_rounds: int = 16, samples: int = 3):
+    """Time bcrypt on this machine; returns (highest rounds within target_ms, timings in ms per rounds)."""
+    timings = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        hasher = bcrypt.using(rounds=rounds)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash('calibration-password')
+            durations.append((time.perf_counter() - start) * 1000)
+        timings[rounds] = sorted(durations)[len(durations) // 2]
+        if timings[rounds] > target_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
 def create_access_token(user_data: dict, expires_delta: timedelta = None, refresh: bool = False):
     """Create JWT access token"""
     if expires_delta:
@@ -1,19 +1,30 @@
-from flask import request
-from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import json
+
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Namespace, Resource, abort, fields, marshal
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 
 from src.books.service import BookService
+from src.tags.service import TagService
 from src.books.schemas import BookCreateSchema, BookUpdateSchema, BookSchema, BookDetailSchema
 from src.auth.dependencies import get_current_user, RoleChecker
+from src.etags import make_etag, etag_headers, not_modified
+from src.fieldsets import FIELDS_PARAM, get_fieldset
+from src.pagination import (
+    PAGINATION_PARAMS, get_pagination_args, pagination_headers,
+    decode_cursor, decode_id_cursor, encode_id_cursor
+)
 
 # namespace
 books_ns = Namespace('books', description='Book operations')
 
-# Service instance
+# Service instances
 book_service = BookService()
+tag_service = TagService()
 
 # Marshmallow schemas
 book_create_schema = BookCreateSchema()
+book_create_many_schema = BookCreateSchema(many=True)
 book_update_schema = BookUpdateSchema()
 book_schema = BookSchema()
 book_detail_schema = BookDetailSchema()
@@ -29,7 +40,10 @@ book_model = books_ns.model('Book', {
     'language': fields.String(description='Language'),
     'user_uid': fields.String(description='User ID'),
     'created_at': fields.DateTime(description='Created At'),
-    'updated_at': fields.DateTime(description='Updated At')
+    'updated_at': fields.DateTime(description='Updated At'),
+    'rating_count': fields.Integer(description='Number of Ratings'),
+    'avg_rating': fields.Float(description='Average Rating'),
+    'rating_histogram': fields.Raw(description='Ratings per Star (1-5)')
 })
 
 book_detail_model = books_ns.model('BookDetail', {
@@ -43,6 +57,9 @@ book_detail_model = books_ns.model('BookDetail', {
     'user_uid': fields.String(description='User ID'),
     'created_at': fields.DateTime(description='Created At'),
     'updated_at': fields.DateTime(description='Updated At'),
+    'rating_count': fields.Integer(description='Number of Ratings'),
+    'avg_rating': fields.Float(description='Average Rating'),
+    'rating_histogram': fields.Raw(description='Ratings per Star (1-5)'),
     'reviews': fields.List(fields.Raw, description='Book Reviews'),
     'tags': fields.List(fields.Raw, description='Book Tags')
 })
@@ -79,34 +96,99 @@ def format_book_response(book_doc):
         if field in book and hasattr(book[field], 'isoformat'):
             book[field] = book[field].isoformat()
     
+    # Average rating from the aggregates maintained by ReviewService
+    rating_count = book.get('rating_count')
+    if rating_count:
+        book['avg_rating'] = round(book.get('rating_sum', 0) / rating_count, 2)
+    
     return book
 
 def get_current_user_id():
     """Get current user ID from JWT"""
+    user_uid = get_jwt().get('user_uid')
+    if user_uid:
+        return user_uid
+    
     user_email = get_jwt_identity()
     from src.auth.service import AuthService
     auth_service = AuthService()
-    user = auth_service.get_user_by_email(user_email)
+    user = auth_service.get_principal(user_email)
     
     # FIX: Check if user exists and has _id before accessing it
     if user and user.get('_id'):
         return str(user['_id'])
     return None  # Return None if user doesn't exist
 
+def wants_stream():
+    """Check if the client asked for an NDJSON export (?stream=1 or Accept header)"""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def get_tag_filter():
+    """Read ?tags=a,b&match=all|any, returns (tag names or None, match_all)"""
+    names = [name.strip() for name in request.args.get('tags', '').split(',') if name.strip()]
+    match = request.args.get('match', 'all').lower()
+    if match not in ('all', 'any'):
+        abort(400, "match must be 'all' or 'any'")
+    return list(dict.fromkeys(names)) or None, match == 'all'
+
+def stream_books_response(fields, model):
+    """Stream every book as one JSON object per line without buffering the catalog"""
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    
+    def generate():
+        for book in book_service.iter_books(batch_size, fields):
+            yield json.dumps(marshal(format_book_response(book), model)) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # =========================
 # Get All Books
 # =========================
 @books_ns.route('/')
 class BookList(Resource):
-    @books_ns.marshal_list_with(book_model)
+    @books_ns.doc(params={
+        **PAGINATION_PARAMS,
+        'fields': FIELDS_PARAM,
+        'stream': 'Set to 1 to export every book as NDJSON',
+        'tags': 'Comma-separated tag names to filter by',
+        'match': "'all' (default) to require every tag, 'any' for at least one (results ordered by book ID)"
+    })
+    @books_ns.response(200, 'Success', [book_model])
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self):
-        """Get all books"""
+        """Get all books, optionally filtered by tags (cursor paginated, or streamed as NDJSON)"""
+        fields, model = get_fieldset(book_model)
+        tag_names, match_all = get_tag_filter()
+        if wants_stream():
+            if tag_names:
+                abort(400, 'Tag filtering is not supported when streaming')
+            return stream_books_response(fields, model)
+        
+        limit, after, with_total = get_pagination_args(decode_id_cursor if tag_names else decode_cursor)
         try:
-            books = book_service.get_all_books()
+            etag = make_etag('books', book_service.get_books_version(), request.query_string.decode())
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            total = None
+            if tag_names:
+                # Ordered by book ID, walking the tags' posting lists
+                book_uids, last_uid = tag_service.get_tagged_book_page(tag_names, match_all, limit, after)
+                books = book_service.get_books_by_ids(book_uids, fields)
+                next_cursor = encode_id_cursor(last_uid) if last_uid else None
+                if with_total and len(tag_names) == 1:
+                    total = tag_service.get_tag_book_count(tag_names[0])
+            else:
+                books, next_cursor = book_service.get_all_books(limit, after, fields)
+                if with_total:
+                    total = book_service.get_books_count()
             formatted_books = [format_book_response(book) for book in books]
-            return formatted_books, 200
+            headers = {**pagination_headers(next_cursor, total), **etag_headers(etag)}
+            return marshal(formatted_books, model), 200, headers
         except Exception as e:
             return {'message': f'Error fetching books: {str(e)}'}, 500
 
@@ -139,20 +221,92 @@ class BookList(Resource):
         except Exception as e:
             return {'message': f'Error creating book: {str(e)}'}, 500
 
+# =========================
+# Bulk Create Books
+# =========================
+@books_ns.route('/bulk')
+class BookBulk(Resource):
+    @books_ns.expect([book_create_model])
+    @books_ns.response(201, 'All books created')
+    @books_ns.response(207, 'Some books failed, see per-item results')
+    @books_ns.response(400, 'Validation error')
+    @jwt_required()
+    @RoleChecker(['admin', 'user'])
+    def post(self):
+        """Create many books in one request"""
+        data = request.get_json()
+        
+        max_books = current_app.config['BULK_MAX_BOOKS']
+        if not isinstance(data, list) or not data:
+            return {'message': 'Expected a non-empty list of books'}, 400
+        if len(data) > max_books:
+            return {'message': f'At most {max_books} books can be created at once'}, 400
+        
+        # Validate input, keeping per-item errors
+        errors = book_create_many_schema.validate(data)
+        
+        try:
+            user_uid = get_current_user_id()
+            if not user_uid:
+                return {'message': 'User not found'}, 404
+            
+            results = book_service.create_books(data, user_uid, errors)
+            created = sum(1 for result in results if result['status'] == 'created')
+            
+            return {
+                'created': created,
+                'failed': len(results) - created,
+                'results': results
+            }, 201 if created == len(results) else 207
+        except Exception as e:
+            return {'message': f'Error creating books: {str(e)}'}, 500
+
+# =========================
+# Search Books
+# =========================
+@books_ns.route('/search')
+class BookSearch(Resource):
+    @books_ns.doc(params={
+        'q': 'Text to search in title, author and publisher',
+        'prefix': 'Set to 1 to match word prefixes (typeahead)',
+        'limit': PAGINATION_PARAMS['limit'],
+        'offset': 'Number of results to skip'
+    })
+    @books_ns.marshal_list_with(book_model)
+    @jwt_required()
+    @RoleChecker(['admin', 'user'])
+    def get(self):
+        """Search books ranked by relevance"""
+        query = request.args.get('q', '').strip()
+        if not query:
+            abort(400, 'Query parameter q is required')
+        
+        limit, _, _ = get_pagination_args()
+        offset = max(0, request.args.get('offset', 0, type=int))
+        prefix = request.args.get('prefix', '').lower() in ('1', 'true')
+        try:
+            books, next_offset = book_service.search_books(query, limit, offset, prefix)
+            formatted_books = [format_book_response(book) for book in books]
+            return formatted_books, 200, pagination_headers(next_offset, cursor_param='offset')
+        except Exception as e:
+            return {'message': f'Error searching books: {str(e)}'}, 500
+
 # =========================
 # Get User Books
 # =========================
 @books_ns.route('/user/<string:user_uid>')
 class UserBooks(Resource):
+    @books_ns.doc(params={'limit': PAGINATION_PARAMS['limit'], 'after': PAGINATION_PARAMS['after']})
     @books_ns.marshal_list_with(book_model)
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self, user_uid):
-        """Get all books for a specific user"""
+        """Get all books for a specific user (cursor paginated)"""
+        limit, after, _ = get_pagination_args()
         try:
-            books = book_service.get_user_books(user_uid)
+            books, next_cursor = book_service.get_user_books(user_uid, limit, after)
             formatted_books = [format_book_response(book) for book in books]
-            return formatted_books, 200
+            return formatted_books, 200, pagination_headers(next_cursor)
         except Exception as e:
             return {'message': f'Error fetching user books: {str(e)}'}, 500
 
@@ -161,17 +315,28 @@ class UserBooks(Resource):
 # =========================
 @books_ns.route('/<string:book_uid>')
 class BookDetail(Resource):
-    @books_ns.marshal_with(book_detail_model)
+    @books_ns.response(200, 'Success', book_detail_model)
+    @books_ns.response(304, 'Not Modified')
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self, book_uid):
         """Get a single book by ID with relationships"""
         try:
+            # Answer conditional requests before doing the joins
+            version = book_service.get_book_version(book_uid)
+            if not version:
+                return {'message': 'Book not found'}, 404
+            
+            etag = make_etag('book', book_uid, version)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
             book = book_service.get_book(book_uid)
             if not book:
                 return {'message': 'Book not found'}, 404
             
-            return format_book_response(book), 200
+            return marshal(format_book_response(book), book_detail_model), 200, etag_headers(etag)
         except Exception as e:
             return {'message': f'Error fetching book: {str(e)}'}, 500
 
@@ -231,18 +396,20 @@ class BookDetail(Resource):
 # =========================
 @books_ns.route('/me/books')
 class MyBooks(Resource):
+    @books_ns.doc(params={'limit': PAGINATION_PARAMS['limit'], 'after': PAGINATION_PARAMS['after']})
     @books_ns.marshal_list_with(book_model)
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self):
-        """Get current user's books"""
+        """Get current user's books (cursor paginated)"""
+        limit, after, _ = get_pagination_args()
         try:
             user_uid = get_current_user_id()
             if not user_uid:
                 return {'message': 'User not found'}, 404
             
-            books = book_service.get_user_books(user_uid)
+            books, next_cursor = book_service.get_user_books(user_uid, limit, after)
             formatted_books = [format_book_response(book) for book in books]
-            return formatted_books, 200
+            return formatted_books, 200, pagination_headers(next_cursor)
         except Exception as e:
             return {'message': f'Error fetching your books: {str(e)}'}, 500
\ No newline at end of file
@@ -1,18 +1,85 @@
+import re
 from bson import ObjectId
 from datetime import datetime
-from src.db.models import get_db
+from flask import current_app
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.db.models import get_db, get_collection_version, bump_collection_version
+from src.extensions import cache
+from src.fieldsets import build_projection
+from src.pagination import KEYSET_SORT, paginate
+from src.reviews.service import RATINGS
+
+SEARCH_FIELDS = ('title', 'author', 'publisher')
+
+def _to_object_id(expr):
+    """Aggregation expression converting a string ID to ObjectId (null if invalid)"""
+    return {'$convert': {'input': expr, 'to': 'objectId', 'onError': None, 'onNull': None}}
+
+def book_cache_key(book_uid: str):
+    return f'book:{book_uid}'
+
+def user_books_cache_key(user_uid: str):
+    return f'user_books:{user_uid}'
+
+def invalidate_book_cache(book_uids=(), user_uids=()):
+    """Evict cached book details and per-user book pages"""
+    keys = [book_cache_key(uid) for uid in book_uids]
+    keys += [user_books_cache_key(uid) for uid in user_uids]
+    cache.delete(*keys)
+
+def _rating_fields(fields):
+    """Stored fields needed to compute avg_rating when it is requested"""
+    if fields and 'avg_rating' in fields:
+        return ('rating_count', 'rating_sum')
+    return ()
+
+def _tokenize(text: str):
+    """Split text into lowercase word tokens"""
+    return re.findall(r'\w+', text.lower())
+
+def _search_terms(book: dict):
+    """Distinct lowercase words of the searchable fields, used for prefix search"""
+    terms = set()
+    for field in SEARCH_FIELDS:
+        terms.update(_tokenize(book.get(field) or ''))
+    return sorted(terms)
 
 class BookService:
     def __init__(self):
         self.db = get_db()
     
-    def get_all_books(self):
-        """Get all books with user relationships"""
-        books = list(self.db.books.find().sort('created_at', -1))
+    def get_all_books(self, limit: int = None, after: str = None, fields: list = None):
+        """Get a page of books with user relationships.
+
+        When fields is given only those fields are fetched and owners are not populated.
+        """
+        projection = build_projection(fields, 'created_at', *_rating_fields(fields))
+        books, next_cursor = paginate(self.db.books, {}, limit, after, projection)
+        if fields is None:
+            self._populate_owners(books)
+        return books, next_cursor
+    
+    def get_books_by_ids(self, book_uids: list, fields: list = None):
+        """Get books for many IDs in one query, in the given order (owners populated unless fields is given)"""
+        object_ids = [ObjectId(uid) for uid in book_uids if ObjectId.is_valid(uid)]
+        if not object_ids:
+            return []
+        
+        projection = build_projection(fields, *_rating_fields(fields))
+        found = {str(book['_id']): book for book in self.db.books.find({'_id': {'$in': object_ids}}, projection)}
+        books = [found[uid] for uid in book_uids if uid in found]
+        if fields is None:
+            self._populate_owners(books)
+        return books
+    
+    def _populate_owners(self, books):
+        """Populate user information for all books with one batched lookup"""
+        from src.auth.service import AuthService, PROFILE_FIELDS
+        users = AuthService().get_users_by_ids((book['user_uid'] for book in books), PROFILE_FIELDS)
         
-        # Populate user information for each book
         for book in books:
-            user = self.db.users.find_one({'_id': ObjectId(book['user_uid'])})
+            user = users.get(book['user_uid'])
             if user:
                 book['user'] = {
                     'uid': str(user['_id']),
@@ -21,92 +88,311 @@ class BookService:
                     'first_name': user.get('first_name'),
                     'last_name': user.get('last_name')
                 }
+    
+    def get_user_books(self, user_uid: str, limit: int = None, after: str = None):
+        """Get a page of books for a specific user (read-through cached)"""
+        page = cache.get_or_set(
+            user_books_cache_key(user_uid),
+            lambda: self._load_user_books(user_uid, limit, after),
+            current_app.config['USER_BOOKS_CACHE_TTL'],
+            field=f'{limit}:{after}'
+        )
+        if not page:
+            return [], None
+        books, next_cursor = page
+        return books, next_cursor
+    
+    def _load_user_books(self, user_uid: str, limit: int = None, after: str = None):
+        try:
+            return paginate(self.db.books, {'user_uid': user_uid}, limit, after)
+        except:
+            return None
+    
+    def iter_books(self, batch_size: int, fields: list = None):
+        """Iterate over every book, fetching from Mongo in bounded batches"""
+        projection = build_projection(fields, *_rating_fields(fields))
+        return self.db.books.find({}, projection).sort(KEYSET_SORT).batch_size(batch_size)
+    
+    def search_books(self, query: str, limit: int, offset: int = 0, prefix: bool = False):
+        """Search books by title, author and publisher.
+
+        Full-word queries are ranked by text score. Prefix queries match every
+        word as a prefix and are ranked by how many words match a whole term,
+        then by how many prefix a title word; only the first
+        SEARCH_PREFIX_CANDIDATES matches are ranked, so very broad prefixes stay
+        cheap at the cost of an approximate ranking. Returns (books, next_offset).
+        """
+        if prefix:
+            tokens = _tokenize(query)
+            if not tokens:
+                return [], None
+            title = {'$toLower': {'$ifNull': ['$title', '']}}
+            title_hits = [
+                {'$cond': [{'$regexMatch': {'input': title, 'regex': f'(^|\\W){re.escape(token)}'}}, 1, 0]}
+                for token in tokens
+            ]
+            cursor = self.db.books.aggregate([
+                {'$match': {'search_terms': {'$all': [re.compile('^' + re.escape(token)) for token in tokens]}}},
+                {'$limit': current_app.config['SEARCH_PREFIX_CANDIDATES']},
+                {'$addFields': {'_prefix_score': {'$add': [
+                    {'$multiply': [2, {'$size': {'$setIntersection': ['$search_terms', tokens]}}]},
+                    *title_hits
+                ]}}},
+                {'$sort': {'_prefix_score': -1, 'title': 1, '_id': 1}},
+                {'$skip': offset},
+                {'$limit': limit + 1},
+                {'$project': {'_prefix_score': 0}}
+            ], hint='search_terms_1')
+            books = list(cursor)
+        else:
+            score = {'$meta': 'textScore'}
+            cursor = self.db.books.find(
+                {'$text': {'$search': query}},
+                {'score': score}
+            ).sort([('score', score)])
+            books = list(cursor.skip(offset).limit(limit + 1))
         
-        return books
+        # One extra document was fetched to know whether another page exists
+        if len(books) > limit:
+            return books[:limit], offset + limit
+        return books, None
+    
+    def reindex_search_terms(self, batch_size: int = 1000):
+        """Recompute search terms for every book, returns the number of books updated"""
+        updated = 0
+        operations = []
+        projection = {field: 1 for field in SEARCH_FIELDS}
+        for book in self.db.books.find({}, projection).batch_size(batch_size):
+            operations.append(UpdateOne({'_id': book['_id']}, {'$set': {'search_terms': _search_terms(book)}}))
+            if len(operations) >= batch_size:
+                updated += self.db.books.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += self.db.books.bulk_write(operations, ordered=False).modified_count
+        return updated
     
-    def get_user_books(self, user_uid: str):
-        """Get all books for a specific user"""
+    def get_book_version(self, book_uid: str):
+        """Get a cheap version stamp for a book, None if it does not exist"""
         try:
-            books = list(self.db.books.find({'user_uid': user_uid}).sort('created_at', -1))
-            return books
+            book = self.db.books.find_one({'_id': ObjectId(book_uid)}, {'version': 1, 'updated_at': 1})
         except:
-            return []
+            return None
+        if not book:
+            return None
+        return f"{book.get('version', 0)}-{book.get('updated_at')}"
+    
+    def get_books_version(self):
+        """Get the version of the books collection, bumped on every book write"""
+        return get_collection_version('books')
+    
+    def get_books_count(self):
+        """Get the estimated number of books"""
+        return self.db.books.estimated_document_count()
     
     def get_book(self, book_uid: str):
-        """Get a single book by ID with relationships"""
-        try:
-            book = self.db.books.find_one({'_id': ObjectId(book_uid)})
-            if not book:
-                return None
-            
-            # Get user information
-            user = self.db.users.find_one({'_id': ObjectId(book['user_uid'])})
-            if user:
-                book['user'] = {
-                    'uid': str(user['_id']),
-                    'username': user.get('username'),
-                    'email': user.get('email')
-                }
-            
-            # Get reviews for this book (if you have a reviews collection)
-            reviews = list(self.db.reviews.find({'book_uid': book_uid}))
-            book['reviews'] = []
-            for review in reviews:
-                review_user = self.db.users.find_one({'_id': ObjectId(review['user_uid'])})
-                book['reviews'].append({
-                    'uid': str(review['_id']),
-                    'rating': review.get('rating'),
-                    'comment': review.get('comment'),
-                    'user': {
-                        'uid': str(review_user['_id']) if review_user else None,
-                        'username': review_user.get('username') if review_user else 'Unknown'
-                    } if review_user else None,
-                    'created_at': review.get('created_at')
-                })
-            
-            # Get tags for this book (if you have a tags collection)
-            book_tags = list(self.db.book_tags.find({'book_uid': book_uid}))
-            book['tags'] = []
-            for book_tag in book_tags:
-                tag = self.db.tags.find_one({'_id': ObjectId(book_tag['tag_uid'])})
-                if tag:
-                    book['tags'].append({
-                        'uid': str(tag['_id']),
-                        'name': tag.get('name'),
-                        'color': tag.get('color')
-                    })
-            
-            return book
-        except Exception as e:
-            print(f"Error getting book: {e}")
+        """Get a single book by ID with relationships (read-through cached)"""
+        return cache.get_or_set(
+            book_cache_key(book_uid),
+            lambda: self._load_book(book_uid),
+            current_app.config['BOOK_CACHE_TTL']
+        )
+    
+    def _load_book(self, book_uid: str):
+        """Book with owner, reviews and tags, None if it does not exist (errors propagate)"""
+        if not ObjectId.is_valid(book_uid):
             return None
+        
+        # Reviews are embedded in the single result document, which MongoDB caps at
+        # 16 MB: past BOOK_DETAIL_EMBEDDED_REVIEWS they are hydrated in batches instead
+        max_reviews = current_app.config['BOOK_DETAIL_EMBEDDED_REVIEWS']
+        
+        # Owner, reviews with their reviewers and tag links in one round trip
+        pipeline = [
+            {'$match': {'_id': ObjectId(book_uid)}},
+            {'$lookup': {
+                'from': 'users',
+                'let': {'user_id': _to_object_id('$user_uid')},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$_id', '$$user_id']}}},
+                    {'$project': {'username': 1, 'email': 1}}
+                ],
+                'as': 'user'
+            }},
+            {'$lookup': {
+                'from': 'reviews',
+                'pipeline': [
+                    {'$match': {'book_uid': book_uid}},
+                    {'$limit': max_reviews + 1},
+                    {'$lookup': {
+                        'from': 'users',
+                        'let': {'user_id': _to_object_id('$user_uid')},
+                        'pipeline': [
+                            {'$match': {'$expr': {'$eq': ['$_id', '$$user_id']}}},
+                            {'$project': {'username': 1}}
+                        ],
+                        'as': 'user'
+                    }}
+                ],
+                'as': 'reviews'
+            }},
+            {'$lookup': {
+                'from': 'book_tags',
+                'pipeline': [
+                    {'$match': {'book_uid': book_uid}},
+                    {'$project': {'_id': 0, 'tag_uid': 1}}
+                ],
+                'as': 'tags'
+            }}
+        ]
+        
+        book = next(self.db.books.aggregate(pipeline), None)
+        if not book:
+            return None
+        
+        # Get user information
+        owners = book.pop('user')
+        if owners:
+            user = owners[0]
+            book['user'] = {
+                'uid': str(user['_id']),
+                'username': user.get('username'),
+                'email': user.get('email')
+            }
+        
+        # Get reviews for this book
+        reviews = book['reviews']
+        if len(reviews) > max_reviews:
+            reviews = self._load_reviews(book_uid)
+        book['reviews'] = []
+        for review in reviews:
+            review_user = review['user'][0] if review['user'] else None
+            book['reviews'].append({
+                'uid': str(review['_id']),
+                'rating': review.get('rating'),
+                'comment': review.get('comment'),
+                'user': {
+                    'uid': str(review_user['_id']),
+                    'username': review_user.get('username')
+                } if review_user else None,
+                'created_at': review.get('created_at')
+            })
+        
+        # Get tags for this book from the tag dictionary
+        from src.tags.service import TagService
+        tags = TagService().get_tags_by_ids([link['tag_uid'] for link in book['tags']])
+        book['tags'] = [
+            {
+                'uid': str(tag['_id']),
+                'name': tag.get('name'),
+                'color': tag.get('color')
+            }
+            for tag in tags.values()
+        ]
+        
+        return book
+    
+    def _load_reviews(self, book_uid: str, batch_size: int = 1000):
+        """A book's reviews with their reviewers (in the aggregation's shape), one users $in per batch"""
+        from src.auth.service import AuthService
+        auth_service = AuthService()
+        reviews = []
+        batch = []
+        
+        def hydrate():
+            users = auth_service.get_users_by_ids((review['user_uid'] for review in batch), ('username',))
+            for review in batch:
+                user = users.get(review['user_uid'])
+                review['user'] = [user] if user else []
+            reviews.extend(batch)
+            batch.clear()
+        
+        for review in self.db.reviews.find({'book_uid': book_uid}).batch_size(batch_size):
+            batch.append(review)
+            if len(batch) >= batch_size:
+                hydrate()
+        if batch:
+            hydrate()
+        return reviews
+    
+    def _build_book_doc(self, book_data: dict, user_uid: str):
+        """Build a new book document from validated input"""
+        # Parse published_date string to datetime
+        published_date = datetime.strptime(book_data['published_date'], "%Y-%m-%d")
+        
+        book_doc = {
+            'title': book_data['title'],
+            'author': book_data['author'],
+            'publisher': book_data['publisher'],
+            'published_date': published_date,
+            'page_count': book_data['page_count'],
+            'language': book_data['language'],
+            'user_uid': user_uid,  # This maintains the relationship
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'rating_count': 0,
+            'rating_sum': 0,
+            'rating_histogram': {str(rating): 0 for rating in RATINGS},
+            'version': 1
+        }
+        book_doc['search_terms'] = _search_terms(book_doc)
+        return book_doc
     
     def create_book(self, book_data: dict, user_uid: str):
         """Create a new book with user relationship"""
         try:
-            # Parse published_date string to datetime
-            published_date = datetime.strptime(book_data['published_date'], "%Y-%m-%d")
-            
-            book_doc = {
-                'title': book_data['title'],
-                'author': book_data['author'],
-                'publisher': book_data['publisher'],
-                'published_date': published_date,
-                'page_count': book_data['page_count'],
-                'language': book_data['language'],
-                'user_uid': user_uid,  # This maintains the relationship
-                'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
-            }
+            book_doc = self._build_book_doc(book_data, user_uid)
             
             result = self.db.books.insert_one(book_doc)
             book_doc['_id'] = result.inserted_id
+            bump_collection_version('books')
+            invalidate_book_cache(user_uids=[user_uid])
             
             return book_doc
         except Exception as e:
             print(f"Error creating book: {e}")
             return None
     
+    def create_books(self, books_data: list, user_uid: str, errors: dict = None):
+        """Create many books with a single unordered insert_many.
+
+        errors maps input indexes to validation errors; those items are skipped.
+        Returns one result per input item, in input order.
+        """
+        errors = errors or {}
+        results = [None] * len(books_data)
+        book_docs = []
+        doc_indexes = []
+        
+        for index, book_data in enumerate(books_data):
+            if index in errors:
+                results[index] = {'index': index, 'status': 'error', 'errors': errors[index]}
+                continue
+            try:
+                book_docs.append(self._build_book_doc(book_data, user_uid))
+                doc_indexes.append(index)
+            except Exception as e:
+                results[index] = {'index': index, 'status': 'error', 'errors': str(e)}
+        
+        failed = {}
+        if book_docs:
+            try:
+                # insert_many assigns each document's _id before sending it
+                self.db.books.insert_many(book_docs, ordered=False)
+            except BulkWriteError as e:
+                failed = {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+            
+            if len(failed) < len(book_docs):
+                bump_collection_version('books')
+                invalidate_book_cache(user_uids=[user_uid])
+        
+        for position, (index, book_doc) in enumerate(zip(doc_indexes, book_docs)):
+            if position in failed:
+                results[index] = {'index': index, 'status': 'error', 'errors': failed[position]}
+            else:
+                results[index] = {'index': index, 'status': 'created', 'uid': str(book_doc['_id'])}
+        
+        return results
+    
     def update_book(self, book_uid: str, update_data: dict):
         """Update a book - only allow if user owns the book"""
         try:
@@ -119,12 +405,21 @@ class BookService:
             
             update_data['updated_at'] = datetime.utcnow()
             
-            result = self.db.books.update_one(
+            # Keep prefix search terms in sync with the searchable fields
+            if any(field in update_data for field in SEARCH_FIELDS):
+                projection = {field: 1 for field in SEARCH_FIELDS}
+                current = self.db.books.find_one({'_id': ObjectId(book_uid)}, projection) or {}
+                update_data['search_terms'] = _search_terms({**current, **update_data})
+            
+            book = self.db.books.find_one_and_update(
                 {'_id': ObjectId(book_uid)},
-                {'$set': update_data}
+                {'$set': update_data, '$inc': {'version': 1}},
+                projection={'user_uid': 1}
             )
             
-            if result.matched_count > 0:
+            if book:
+                bump_collection_version('books')
+                invalidate_book_cache([book_uid], [book.get('user_uid')])
                 return self.get_book(book_uid)
             return None
         except Exception as e:
@@ -134,8 +429,14 @@ class BookService:
     def delete_book(self, book_uid: str):
         """Delete a book - only allow if user owns the book"""
         try:
-            result = self.db.books.delete_one({'_id': ObjectId(book_uid)})
-            return result.deleted_count > 0
+            book = self.db.books.find_one_and_delete({'_id': ObjectId(book_uid)}, projection={'user_uid': 1})
+            if book:
+                # Drop the book's tag links so tag book counts stay accurate
+                from src.tags.service import TagService
+                TagService().unlink_book(book_uid)
+                bump_collection_version('books')
+                invalidate_book_cache([book_uid], [book.get('user_uid')])
+            return book is not None
         except Exception as e:
             print(f"Error deleting book: {e}")
             return None
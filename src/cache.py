@@ -0,0 +1,87 @@
+import logging
+
+import redis
+from bson import json_util
+
+from src import metrics
+
+class Cache:
+    """Read-through Redis cache for serialized payloads.
+
+    Redis errors are logged and treated as cache misses so the API keeps
+    serving from MongoDB when Redis is unavailable.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.enabled = False
+
+    def init_app(self, app, client=None):
+        self.enabled = app.config['CACHE_ENABLED']
+        self.client = client or redis.Redis.from_url(
+            app.config['CACHE_REDIS_URL'],
+            socket_timeout=app.config['CACHE_SOCKET_TIMEOUT']
+        )
+        metrics.register_gauge('cache.hit_rate', self.hit_rate)
+
+    def get(self, key: str, field: str = None):
+        """Get a cached value, or a field of a cached hash"""
+        if not self.enabled:
+            return None
+        try:
+            raw = self.client.hget(key, field) if field else self.client.get(key)
+        except redis.RedisError as e:
+            logging.warning(f"Cache get failed for {key}: {e}")
+            metrics.incr('cache.errors')
+            return None
+        
+        if raw is None:
+            metrics.incr('cache.misses')
+            return None
+        metrics.incr('cache.hits')
+        return json_util.loads(raw)
+
+    def set(self, key: str, value, ttl: int, field: str = None):
+        """Cache a value for ttl seconds, or a field of a hash that expires ttl seconds after its first field"""
+        if not self.enabled:
+            return
+        try:
+            raw = json_util.dumps(value)
+            if field:
+                pipe = self.client.pipeline()
+                pipe.hset(key, field, raw)
+                # Only a new hash gets a TTL, so later fields cannot keep older ones alive (Redis 7+)
+                pipe.expire(key, ttl, nx=True)
+                pipe.execute()
+            else:
+                self.client.set(key, raw, ex=ttl)
+        except redis.RedisError as e:
+            logging.warning(f"Cache set failed for {key}: {e}")
+            metrics.incr('cache.errors')
+
+    def get_or_set(self, key: str, loader, ttl: int, field: str = None):
+        """Return the cached value, loading and caching it on a miss (None is never cached)"""
+        value = self.get(key, field)
+        if value is not None:
+            return value
+        
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl, field)
+        return value
+
+    def delete(self, *keys):
+        """Evict keys"""
+        if not self.enabled or not keys:
+            return
+        try:
+            self.client.delete(*keys)
+            metrics.incr('cache.evictions', len(keys))
+        except redis.RedisError as e:
+            logging.warning(f"Cache delete failed for {keys}: {e}")
+            metrics.incr('cache.errors')
+
+    def hit_rate(self):
+        hits = metrics.get_counter('cache.hits')
+        lookups = hits + metrics.get_counter('cache.misses')
+        return round(hits / lookups, 4) if lookups else None
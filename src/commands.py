@@ -0,0 +1,54 @@
+import time
+import click
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI"""
+
+    @app.cli.command('reindex-books')
+    def reindex_books():
+        """Rebuild prefix search terms for every book"""
+        from src.books.service import BookService
+        updated = BookService().reindex_search_terms()
+        click.echo(f"✅ Reindexed search terms for {updated} books")
+
+    @app.cli.command('reconcile-ratings')
+    def reconcile_ratings():
+        """Recompute rating aggregates on every book from its reviews"""
+        from src.reviews.service import ReviewService
+        updated = ReviewService().reconcile_book_ratings()
+        click.echo(f"✅ Reconciled rating aggregates for {updated} books")
+
+    @app.cli.command('reconcile-tag-counts')
+    def reconcile_tag_counts():
+        """Recompute the book count on every tag from book_tags"""
+        from src.tags.service import TagService
+        updated = TagService().reconcile_book_counts()
+        click.echo(f"✅ Reconciled book counts for {updated} tags")
+
+    @app.cli.command('calibrate-bcrypt')
+    @click.option('--target-ms', type=float, default=None, help='Target hash time in milliseconds')
+    def calibrate_bcrypt(target_ms):
+        """Pick the bcrypt cost that hashes within the target time on this machine"""
+        from src.auth.utils import measure_bcrypt_rounds
+        target_ms = target_ms or app.config['BCRYPT_TARGET_MS']
+        rounds, timings = measure_bcrypt_rounds(target_ms)
+        for cost, duration in timings.items():
+            click.echo(f"  rounds={cost}: {duration:.1f} ms")
+        click.echo(f"✅ Set BCRYPT_ROUNDS={rounds} to stay within {target_ms:.0f} ms per hash")
+
+    @app.cli.command('drain-email-outbox')
+    @click.option('--loop', is_flag=True, help='Keep polling the outbox instead of exiting when it is empty')
+    def drain_email_outbox(loop):
+        """Deliver pending emails from the outbox (for deployments without Celery beat)"""
+        from src.db.models import get_db
+        from src.outbox import drain_outbox, worker_id
+        from src.auth.routes import send_real_email_sync
+        owner = worker_id()
+        while True:
+            sent, failed = drain_outbox(get_db(), send_real_email_sync, owner)
+            if sent or failed:
+                click.echo(f"✅ Outbox batch: {sent} sent, {failed} failed")
+            elif loop:
+                time.sleep(app.config['EMAIL_OUTBOX_POLL_INTERVAL'])
+            else:
+                break
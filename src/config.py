@@ -13,6 +13,15 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=3) 
+    # Compare the token's generation with the (cached) user's on each request
+    JWT_CHECK_TOKEN_VERSION = os.getenv('JWT_CHECK_TOKEN_VERSION', 'True').lower() == 'true'
+    
+    # Token blocklist (revoked JTIs in Redis, Bloom filter in each worker)
+    BLOCKLIST_BLOOM_CAPACITY = int(os.getenv('BLOCKLIST_BLOOM_CAPACITY', 100000))
+    BLOCKLIST_PUBSUB = os.getenv('BLOCKLIST_PUBSUB', 'True').lower() == 'true'
+    BLOCKLIST_RETRY_DELAY = float(os.getenv('BLOCKLIST_RETRY_DELAY', 5))
+    # Rebuilt from Redis so JTIs of expired tokens leave the filter
+    BLOCKLIST_BLOOM_REBUILD_INTERVAL = int(os.getenv('BLOCKLIST_BLOOM_REBUILD_INTERVAL', 600))
     
     # MongoDB
     MONGODB_URI = os.environ.get('MONGODB_URI') or 'mongodb://localhost:27017/inkcircle'
@@ -21,6 +30,39 @@ class Config:
     # Redis
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Cache
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'True').lower() == 'true'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or REDIS_URL
+    CACHE_SOCKET_TIMEOUT = float(os.getenv('CACHE_SOCKET_TIMEOUT', 0.5))
+    BOOK_CACHE_TTL = int(os.getenv('BOOK_CACHE_TTL', 300))
+    USER_BOOKS_CACHE_TTL = int(os.getenv('USER_BOOKS_CACHE_TTL', 60))
+    
+    # Book detail: reviews embedded by the aggregation before falling back to batched lookups
+    BOOK_DETAIL_EMBEDDED_REVIEWS = int(os.getenv('BOOK_DETAIL_EMBEDDED_REVIEWS', 500))
+    
+    # bcrypt cost (see `flask calibrate-bcrypt`); unset keeps passlib's default
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 0)) or None
+    BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 100))
+    
+    # Password hashing pool (bcrypt runs off the request thread)
+    PASSWORD_POOL_ENABLED = os.getenv('PASSWORD_POOL_ENABLED', 'True').lower() == 'true'
+    PASSWORD_POOL_SIZE = int(os.getenv('PASSWORD_POOL_SIZE', 2))
+    PASSWORD_POOL_QUEUE_SIZE = int(os.getenv('PASSWORD_POOL_QUEUE_SIZE', 32))
+    PASSWORD_POOL_TIMEOUT = float(os.getenv('PASSWORD_POOL_TIMEOUT', 10))
+    PASSWORD_RETRY_AFTER = int(os.getenv('PASSWORD_RETRY_AFTER', 1))
+    
+    # Login throttling (attempts per LOGIN_RATE_WINDOW seconds)
+    LOGIN_RATE_LIMIT_ENABLED = os.getenv('LOGIN_RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    LOGIN_RATE_WINDOW = int(os.getenv('LOGIN_RATE_WINDOW', 60))
+    LOGIN_IP_LIMIT = int(os.getenv('LOGIN_IP_LIMIT', 20))
+    LOGIN_EMAIL_LIMIT = int(os.getenv('LOGIN_EMAIL_LIMIT', 5))
+    # Number of reverse proxies (e.g. nginx) whose X-Forwarded-For is trusted
+    LOGIN_TRUSTED_PROXIES = int(os.getenv('LOGIN_TRUSTED_PROXIES', 0))
+    
+    # Principal cache (role / verification lookups for authorization)
+    PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', 10000))
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', 30))
+    
     # Celery
     CELERY_BROKER_URL = REDIS_URL
     CELERY_RESULT_BACKEND = REDIS_URL
@@ -38,6 +80,39 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER') or os.getenv('MAIL_USERNAME')
     MAIL_DEBUG = os.getenv('MAIL_DEBUG', 'False').lower() == 'true'
+    SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 30))
+    
+    # Email outbox (drained by the Celery beat task or `flask drain-email-outbox`)
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+    EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', 120))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    EMAIL_OUTBOX_RETRY_BASE = int(os.getenv('EMAIL_OUTBOX_RETRY_BASE', 30))
+    EMAIL_OUTBOX_RETRY_MAX = int(os.getenv('EMAIL_OUTBOX_RETRY_MAX', 3600))
+    EMAIL_OUTBOX_POLL_INTERVAL = int(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+    # Seconds a record is kept after it is queued, sent or given up on (pending ones included)
+    EMAIL_OUTBOX_RETENTION = int(os.getenv('EMAIL_OUTBOX_RETENTION', 7 * 24 * 3600))
+    
+    # In-process email delivery when no Celery worker is reachable
+    EMAIL_EXECUTOR_ENABLED = os.getenv('EMAIL_EXECUTOR_ENABLED', 'True').lower() == 'true'
+    EMAIL_EXECUTOR_WORKERS = int(os.getenv('EMAIL_EXECUTOR_WORKERS', 2))
+    EMAIL_EXECUTOR_QUEUE_SIZE = int(os.getenv('EMAIL_EXECUTOR_QUEUE_SIZE', 100))
+    EMAIL_EXECUTOR_DRAIN_TIMEOUT = float(os.getenv('EMAIL_EXECUTOR_DRAIN_TIMEOUT', 10))
+    
+    # Tag dictionary (in-process tag ID <-> name map)
+    TAG_CACHE_PUBSUB = os.getenv('TAG_CACHE_PUBSUB', 'True').lower() == 'true'
+    TAG_CACHE_REFRESH = int(os.getenv('TAG_CACHE_REFRESH', 60))
+    TAG_CACHE_RETRY_DELAY = float(os.getenv('TAG_CACHE_RETRY_DELAY', 5))
+    
+    # Pagination
+    DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 20))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+    
+    # Prefix search ranks at most this many matches
+    SEARCH_PREFIX_CANDIDATES = int(os.getenv('SEARCH_PREFIX_CANDIDATES', 1000))
+    
+    # Bulk operations
+    BULK_MAX_BOOKS = int(os.getenv('BULK_MAX_BOOKS', 1000))
     
     # App
     DOMAIN = os.environ.get('DOMAIN', 'http://localhost:5000')
@@ -47,9 +122,20 @@ class DevelopmentConfig(Config):
 
 class ProductionConfig(Config):
     DEBUG = False
+    # Production runs behind nginx, which appends the client IP to X-Forwarded-For
+    LOGIN_TRUSTED_PROXIES = int(os.getenv('LOGIN_TRUSTED_PROXIES', 1))
+
+class TestingConfig(Config):
+    TESTING = True
+    MONGODB_DB = 'inkcircle_test'
+    # Background subscribers and senders stay off; tests drive them directly
+    BLOCKLIST_PUBSUB = False
+    TAG_CACHE_PUBSUB = False
+    EMAIL_EXECUTOR_ENABLED = False
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
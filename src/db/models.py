@@ -1,13 +1,18 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
 from flask import current_app
 
 client = None
 db = None
 
-def init_db(app):
+def connect_db(uri, name):
+    """Connect without creating indexes (for worker processes)"""
     global client, db
-    client = MongoClient(app.config['MONGODB_URI'])
-    db = client[app.config['MONGODB_DB']]
+    client = MongoClient(uri)
+    db = client[name]
+    return db
+
+def init_db(app):
+    connect_db(app.config['MONGODB_URI'], app.config['MONGODB_DB'])
     
     # Create indexes for users
     db.users.create_index('email', unique=True)
@@ -17,18 +22,34 @@ def init_db(app):
     db.books.create_index('title')
     db.books.create_index('author')
     db.books.create_index([('user_uid', ASCENDING), ('created_at', DESCENDING)])
+    db.books.create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
+    db.books.create_index(
+        [('title', TEXT), ('author', TEXT), ('publisher', TEXT)],
+        weights={'title': 10, 'author': 5, 'publisher': 1},
+        name='books_text_search'
+    )
+    db.books.create_index('search_terms')
     
     # Create indexes for reviews
     db.reviews.create_index([('book_uid', ASCENDING), ('created_at', DESCENDING)])
+    db.reviews.create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
     db.reviews.create_index([('user_uid', ASCENDING), ('book_uid', ASCENDING)], unique=True)
     db.reviews.create_index('user_uid')
     db.reviews.create_index('book_uid')
     
     # Create indexes for tags
     db.tags.create_index('name', unique=True)
+    db.tags.create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
+    db.tags.create_index([('book_count', DESCENDING), ('_id', DESCENDING)])
     db.book_tags.create_index([('book_uid', ASCENDING), ('tag_uid', ASCENDING)], unique=True)
     db.book_tags.create_index('book_uid')
     db.book_tags.create_index('tag_uid')
+    db.book_tags.create_index([('tag_uid', ASCENDING), ('book_uid', ASCENDING)])
+    
+    # Create indexes for the email outbox (every record expires, whatever its status)
+    db.email_outbox.create_index([('status', ASCENDING), ('next_attempt_at', ASCENDING)])
+    db.email_outbox.create_index([('status', ASCENDING), ('lease_expires_at', ASCENDING)])
+    db.email_outbox.create_index('expires_at', expireAfterSeconds=0)
     
     print("✅ MongoDB connected and indexes created")
 
@@ -36,4 +57,30 @@ def get_db():
     return db
 
 def get_collection(collection_name):
-    return db[collection_name]
\ No newline at end of file
+    return db[collection_name]
+
+def get_collection_version(collection_name):
+    """Current version of a collection, bumped on every write to it"""
+    doc = db.collection_versions.find_one({'_id': collection_name})
+    return doc['version'] if doc else 0
+
+def bump_collection_version(*collection_names):
+    """Increment the version of one or more collections in a single update"""
+    if not collection_names:
+        return
+    result = db.collection_versions.update_many(
+        {'_id': {'$in': list(collection_names)}},
+        {'$inc': {'version': 1}}
+    )
+    if result.matched_count == len(collection_names):
+        return
+    
+    # First bump of some collection: create its version document
+    existing = {doc['_id'] for doc in db.collection_versions.find({'_id': {'$in': list(collection_names)}}, {'_id': 1})}
+    for collection_name in collection_names:
+        if collection_name not in existing:
+            db.collection_versions.update_one(
+                {'_id': collection_name},
+                {'$inc': {'version': 1}},
+                upsert=True
+            )
\ No newline at end of file
@@ -0,0 +1,171 @@
+import atexit
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from src import metrics
+from src.db.models import get_db
+from src.outbox import PENDING, FAILED, claim, deliver, retry_delay, worker_id
+
+class EmailExecutor:
+    """Bounded pool of daemon threads delivering outbox emails inside the web process.
+
+    Used when no Celery worker is reachable, so single-container deployments
+    still send mail off the request thread. EMAIL_EXECUTOR_WORKERS threads send
+    while up to EMAIL_EXECUTOR_QUEUE_SIZE emails wait; beyond that the email
+    simply stays in the outbox for the next drain. Failed sends are retried
+    after the outbox backoff. On SIGTERM or interpreter exit queued sends are
+    drained for up to EMAIL_EXECUTOR_DRAIN_TIMEOUT; whatever is left is skipped
+    and stays pending in the outbox.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.workers = 0
+        self.queue_size = 0
+        self.drain_timeout = 0
+        self._queue = None
+        self._pid = None
+        self._in_flight = 0
+        self._timers = set()
+        self._accepting = True
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def init_app(self, app):
+        self.enabled = app.config['EMAIL_EXECUTOR_ENABLED']
+        self.workers = app.config['EMAIL_EXECUTOR_WORKERS']
+        self.queue_size = app.config['EMAIL_EXECUTOR_QUEUE_SIZE']
+        self.drain_timeout = app.config['EMAIL_EXECUTOR_DRAIN_TIMEOUT']
+        metrics.register_gauge('email_executor.in_flight', lambda: self._in_flight)
+        metrics.register_gauge('email_executor.queue_depth', self.queue_depth)
+        metrics.register_gauge('email_executor.scheduled_retries', lambda: len(self._timers))
+        atexit.register(self.shutdown)
+        self._install_sigterm_handler()
+
+    def _install_sigterm_handler(self):
+        # Container stops send SIGTERM, which would otherwise skip atexit
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def on_sigterm(signum, frame):
+            self.shutdown()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                sys.exit(0)
+
+        signal.signal(signal.SIGTERM, on_sigterm)
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _start(self):
+        # Started lazily so each forked web worker owns its threads
+        with self._lock:
+            if self._queue is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'email-{index}', daemon=True)
+                thread.start()
+
+    def submit(self, outbox_id) -> bool:
+        """Queue delivery of an outbox record, False if disabled, stopping or full"""
+        if not self.enabled or not self._accepting:
+            return False
+
+        self._start()
+        try:
+            self._queue.put_nowait(outbox_id)
+        except queue.Full:
+            metrics.incr('email_executor.rejections')
+            return False
+        metrics.incr('email_executor.submitted')
+        return True
+
+    def _work(self):
+        while True:
+            outbox_id = self._queue.get()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                if self._stopping:
+                    # Past the drain timeout: leave the record pending in the outbox
+                    metrics.incr('email_executor.skipped')
+                else:
+                    self._deliver(outbox_id)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._idle.notify_all()
+                self._queue.task_done()
+
+    def _deliver(self, outbox_id):
+        from src.auth.routes import send_real_email_sync
+        try:
+            db = get_db()
+            owner = worker_id()
+            doc = claim(db, outbox_id, owner)
+            if not doc:
+                # Already delivered or leased by another worker
+                return
+
+            status = deliver(db, doc, send_real_email_sync, owner)
+            if status == PENDING:
+                metrics.incr('email_executor.retries')
+                self._schedule_retry(outbox_id, retry_delay(doc.get('attempts', 0) + 1))
+            elif status == FAILED:
+                metrics.incr('email_executor.failures')
+            else:
+                metrics.incr('email_executor.sent')
+        except Exception as e:
+            metrics.incr('email_executor.errors')
+            print(f"❌ [EMAIL] In-process delivery of {outbox_id} failed: {e}")
+
+    def _schedule_retry(self, outbox_id, delay):
+        def retry():
+            with self._lock:
+                self._timers.discard(timer)
+            self.submit(outbox_id)
+
+        timer = threading.Timer(delay, retry)
+        timer.daemon = True
+        with self._lock:
+            if not self._accepting:
+                return
+            self._timers.add(timer)
+        timer.start()
+
+    def shutdown(self):
+        """Stop accepting work and send what is queued for up to EMAIL_EXECUTOR_DRAIN_TIMEOUT.
+
+        Anything not sent by then is skipped and stays pending in the outbox.
+        """
+        with self._lock:
+            if not self._accepting:
+                return
+            self._accepting = False
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        if self._queue is None or self._pid != os.getpid():
+            return
+
+        deadline = time.monotonic() + self.drain_timeout
+        with self._lock:
+            while (self._in_flight or self._queue.qsize()) and time.monotonic() < deadline:
+                self._idle.wait(max(0, deadline - time.monotonic()))
+            self._stopping = True
+            remaining = self._in_flight + self._queue.qsize()
+
+        if remaining:
+            print(f"⚠️ [EMAIL] {remaining} emails left in the outbox at shutdown")
+
+email_executor = EmailExecutor()
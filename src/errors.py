@@ -26,6 +26,12 @@ class AccountNotVerified(AppError):
 class InvalidCredentials(AppError):
     pass
 
+class InvalidCursor(AppError):
+    pass
+
+class PasswordPoolBusy(AppError):
+    pass
+
 # Error handlers
 def register_error_handlers(app):
     @app.errorhandler(AppError)
@@ -0,0 +1,16 @@
+import hashlib
+
+from flask import Response, request
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag value from version parts"""
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+def etag_headers(etag: str) -> dict:
+    return {'ETag': f'"{etag}"'}
+
+def not_modified(etag: str):
+    """Return a 304 response if the request's If-None-Match matches, else None"""
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=etag_headers(etag))
+    return None
@@ -1,5 +1,7 @@
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
+from src.cache import Cache
 
 jwt = JWTManager()
-mail = Mail()
\ No newline at end of file
+mail = Mail()
+cache = Cache()
\ No newline at end of file
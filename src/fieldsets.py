@@ -0,0 +1,31 @@
+from flask import request
+from flask_restx import abort
+
+# Swagger docs for list endpoints supporting sparse fieldsets
+FIELDS_PARAM = 'Comma separated fields to return, e.g. title,author'
+
+def get_fieldset(model):
+    """Parse ?fields= into the requested field names and a model trimmed to them.
+
+    Returns (None, model) when the parameter is absent and aborts with 400
+    on unknown fields. 'uid' is always returned.
+    """
+    raw = request.args.get('fields', '')
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    if not requested:
+        return None, model
+    
+    unknown = sorted(requested - set(model))
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    
+    fields = [name for name in model if name == 'uid' or name in requested]
+    return fields, {name: model[name] for name in fields}
+
+def build_projection(fields, *required):
+    """Mongo projection for the requested fields plus fields the service itself needs"""
+    if fields is None:
+        return None
+    projection = {name: 1 for name in fields if name != 'uid'}
+    projection.update({name: 1 for name in required})
+    return projection
@@ -0,0 +1,31 @@
+import threading
+from collections import defaultdict
+
+# Process-local counters and gauges, exposed by the /metrics route
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+
+def incr(name: str, value: int = 1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] += value
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+def register_gauge(name: str, func):
+    """Register a callable whose value is read on every snapshot"""
+    _gauges[name] = func
+
+def snapshot() -> dict:
+    """Current value of every counter and gauge"""
+    with _lock:
+        data = dict(_counters)
+    for name, func in _gauges.items():
+        try:
+            data[name] = func()
+        except Exception:
+            data[name] = None
+    return data
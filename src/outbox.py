@@ -0,0 +1,145 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, ReturnDocument
+from src.config import Config
+from src.db.models import get_db
+from src import metrics
+
+# Transactional emails are written to the email_outbox collection by the request
+# and delivered by a worker (Celery beat or `flask drain-email-outbox`), which
+# leases records in batches so several workers can drain it concurrently.
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+def worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def expiry(now: datetime) -> datetime:
+    """When a record is purged; bodies carry live verification and reset links"""
+    return now + timedelta(seconds=Config.EMAIL_OUTBOX_RETENTION)
+
+def enqueue_email(recipients, subject, html_body, text_body=None):
+    """Record an email for delivery, returns the outbox id"""
+    now = datetime.utcnow()
+    result = get_db().email_outbox.insert_one({
+        'recipients': recipients if isinstance(recipients, list) else [recipients],
+        'subject': subject,
+        'html_body': html_body,
+        'text_body': text_body,
+        'status': PENDING,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'expires_at': expiry(now),
+        'created_at': now,
+        'updated_at': now
+    })
+    metrics.incr('email_outbox.enqueued')
+    return result.inserted_id
+
+def claim_batch(db, owner: str, batch_size: int = None, lease_seconds: int = None):
+    """Lease up to batch_size due records (pending, or sending with an expired lease)"""
+    batch_size = batch_size or Config.EMAIL_OUTBOX_BATCH_SIZE
+    lease_seconds = lease_seconds or Config.EMAIL_OUTBOX_LEASE_SECONDS
+    now = datetime.utcnow()
+    claimed = []
+    for _ in range(batch_size):
+        doc = db.email_outbox.find_one_and_update(
+            {'$or': [
+                {'status': PENDING, 'next_attempt_at': {'$lte': now}},
+                {'status': SENDING, 'lease_expires_at': {'$lte': now}}
+            ]},
+            {'$set': {
+                'status': SENDING,
+                'lease_owner': owner,
+                'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                'updated_at': now
+            }},
+            sort=[('next_attempt_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not doc:
+            break
+        claimed.append(doc)
+    return claimed
+
+def retry_delay(attempts: int) -> int:
+    """Exponential backoff in seconds after the given number of failed attempts"""
+    return min(Config.EMAIL_OUTBOX_RETRY_BASE * 2 ** (attempts - 1), Config.EMAIL_OUTBOX_RETRY_MAX)
+
+def mark_sent(db, doc, owner: str):
+    now = datetime.utcnow()
+    db.email_outbox.update_one(
+        {'_id': doc['_id'], 'lease_owner': owner},
+        {
+            '$set': {'status': SENT, 'sent_at': now, 'expires_at': expiry(now), 'updated_at': now},
+            '$inc': {'attempts': 1},
+            '$unset': {'lease_owner': '', 'lease_expires_at': '', 'last_error': ''}
+        }
+    )
+
+def mark_failed(db, doc, owner: str, error: str):
+    """Schedule a retry with backoff, or give up after EMAIL_OUTBOX_MAX_ATTEMPTS"""
+    now = datetime.utcnow()
+    attempts = doc.get('attempts', 0) + 1
+    update = {'attempts': attempts, 'last_error': error, 'updated_at': now}
+    if attempts >= Config.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        update['status'] = FAILED
+        update['expires_at'] = expiry(now)
+    else:
+        update['status'] = PENDING
+        update['next_attempt_at'] = now + timedelta(seconds=retry_delay(attempts))
+    db.email_outbox.update_one(
+        {'_id': doc['_id'], 'lease_owner': owner},
+        {'$set': update, '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+    )
+    return update['status']
+
+def claim(db, outbox_id, owner: str, lease_seconds: int = None):
+    """Lease one record if it is still pending, returns it or None"""
+    lease_seconds = lease_seconds or Config.EMAIL_OUTBOX_LEASE_SECONDS
+    now = datetime.utcnow()
+    return db.email_outbox.find_one_and_update(
+        {'_id': outbox_id, 'status': PENDING},
+        {'$set': {
+            'status': SENDING,
+            'lease_owner': owner,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds),
+            'updated_at': now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+def deliver(db, doc, send, owner: str):
+    """Send one leased record with send(recipients, subject, html_body, text_body).
+
+    send returns a truthy value on success; a falsy value or an exception is a
+    failed attempt. Returns the record's new status.
+    """
+    try:
+        error = None if send(doc['recipients'], doc['subject'], doc['html_body'], doc.get('text_body')) else 'Send failed'
+    except Exception as e:
+        error = str(e)
+
+    if error is None:
+        mark_sent(db, doc, owner)
+        metrics.incr('email_outbox.sent')
+        return SENT
+
+    status = mark_failed(db, doc, owner, error)
+    metrics.incr('email_outbox.dead' if status == FAILED else 'email_outbox.retried')
+    print(f"❌ [OUTBOX] Failed to send {doc['_id']} ({status}): {error}")
+    return status
+
+def drain_outbox(db, send, owner: str = None, batch_size: int = None):
+    """Claim one batch and deliver it, returns (sent, failed) for the batch"""
+    owner = owner or worker_id()
+    sent = failed = 0
+    for doc in claim_batch(db, owner, batch_size):
+        if deliver(db, doc, send, owner) == SENT:
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
@@ -0,0 +1,100 @@
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from bson import ObjectId
+from flask import current_app, request
+from flask_restx import abort
+from pymongo import DESCENDING
+
+from src.errors import InvalidCursor
+
+# Swagger docs for paginated list endpoints
+PAGINATION_PARAMS = {
+    'limit': 'Page size',
+    'after': 'Cursor returned in the Link header of the previous page',
+    'count': 'Set to 1 to include an estimated X-Total-Count header'
+}
+
+KEYSET_SORT = [('created_at', DESCENDING), ('_id', DESCENDING)]
+
+def encode_cursor(doc):
+    """Build an opaque cursor from a document's (created_at, _id)"""
+    payload = json.dumps({'c': doc['created_at'].isoformat(), 'i': str(doc['_id'])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Decode a cursor back into (created_at, _id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['c']), ObjectId(payload['i'])
+    except Exception:
+        raise InvalidCursor('Invalid pagination cursor')
+
+def encode_id_cursor(value: str):
+    """Build an opaque cursor from the last ID of a page ordered by ID"""
+    return base64.urlsafe_b64encode(json.dumps({'i': value}).encode()).decode().rstrip('=')
+
+def decode_id_cursor(cursor: str):
+    """Decode an ID cursor back into the ID"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode()))['i']
+        if not ObjectId.is_valid(value):
+            raise ValueError(value)
+        return value
+    except Exception:
+        raise InvalidCursor('Invalid pagination cursor')
+
+def paginate(collection, query: dict, limit: int = None, after: str = None, projection: dict = None):
+    """Fetch one page ordered by (created_at, _id) descending.
+
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    """
+    if after:
+        created_at, last_id = decode_cursor(after)
+        query = {'$and': [query, {'$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': last_id}}
+        ]}]}
+    
+    cursor = collection.find(query, projection).sort(KEYSET_SORT)
+    if limit is None:
+        return list(cursor), None
+    
+    # Fetch one extra document to know whether another page exists
+    docs = list(cursor.limit(limit + 1))
+    if len(docs) > limit:
+        return docs[:limit], encode_cursor(docs[limit - 1])
+    return docs, None
+
+def get_pagination_args(decode=decode_cursor):
+    """Read ?limit=&after=&count= from the request, aborting with 400 on a bad cursor"""
+    default_limit = current_app.config['DEFAULT_PAGE_SIZE']
+    max_limit = current_app.config['MAX_PAGE_SIZE']
+    
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    
+    after = request.args.get('after') or None
+    if after:
+        try:
+            decode(after)
+        except InvalidCursor as e:
+            abort(400, str(e))
+    
+    with_total = request.args.get('count', '').lower() in ('1', 'true')
+    return limit, after, with_total
+
+def pagination_headers(next_cursor=None, total: int = None, cursor_param: str = 'after'):
+    """Build Link (rel="next") and X-Total-Count response headers"""
+    headers = {}
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args[cursor_param] = next_cursor
+        headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    if total is not None:
+        headers['X-Total-Count'] = str(total)
+    return headers
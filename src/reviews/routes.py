@@ -1,10 +1,13 @@
 from flask import request
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, marshal
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from src.reviews.service import ReviewService
 from src.reviews.schemas import ReviewCreateSchema, ReviewSchema, ReviewWithUserSchema
 from src.auth.dependencies import RoleChecker
+from src.etags import make_etag, etag_headers, not_modified
+from src.fieldsets import FIELDS_PARAM, get_fieldset
+from src.pagination import PAGINATION_PARAMS, get_pagination_args, pagination_headers
 
 # Create namespace
 reviews_ns = Namespace('reviews', description='Review operations')
@@ -65,15 +68,25 @@ def format_review_response(review_doc):
 # =========================
 @reviews_ns.route('/')
 class ReviewList(Resource):
-    @reviews_ns.marshal_list_with(review_with_user_model)
+    @reviews_ns.doc(params={**PAGINATION_PARAMS, 'fields': FIELDS_PARAM})
+    @reviews_ns.response(200, 'Success', [review_with_user_model])
     @jwt_required()
     @RoleChecker(['admin'])
     def get(self):
-        """Get all reviews (Admin only)"""
+        """Get all reviews (Admin only, cursor paginated)"""
+        fields, model = get_fieldset(review_with_user_model)
+        limit, after, with_total = get_pagination_args()
         try:
-            reviews = review_service.get_all_reviews()
+            etag = make_etag('reviews', review_service.get_reviews_version(), request.query_string.decode())
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            reviews, next_cursor = review_service.get_all_reviews(limit, after, fields)
             formatted_reviews = [format_review_response(review) for review in reviews]
-            return formatted_reviews, 200
+            total = review_service.get_reviews_count() if with_total else None
+            headers = {**pagination_headers(next_cursor, total), **etag_headers(etag)}
+            return marshal(formatted_reviews, model), 200, headers
         except Exception as e:
             return {'message': f'Error fetching reviews: {str(e)}'}, 500
 
@@ -126,15 +139,25 @@ class BookReviews(Resource):
         except Exception as e:
             return {'message': f'Error creating review: {str(e)}'}, 500
 
-    @reviews_ns.marshal_list_with(review_with_user_model)
+    @reviews_ns.response(200, 'Success', [review_with_user_model])
+    @reviews_ns.response(304, 'Not Modified')
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self, book_uid):
         """Get all reviews for a specific book"""
         try:
+            headers = {}
+            version = review_service.get_book_reviews_version(book_uid)
+            if version:
+                etag = make_etag('book-reviews', book_uid, version)
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+                headers = etag_headers(etag)
+            
             reviews = review_service.get_book_reviews(book_uid)
             formatted_reviews = [format_review_response(review) for review in reviews]
-            return formatted_reviews, 200
+            return marshal(formatted_reviews, review_with_user_model), 200, headers
         except Exception as e:
             return {'message': f'Error fetching book reviews: {str(e)}'}, 500
 
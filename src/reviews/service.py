@@ -1,30 +1,46 @@
 from bson import ObjectId
 from datetime import datetime
-from src.db.models import get_db
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from src.db.models import get_db, get_collection_version, bump_collection_version
+from src.fieldsets import build_projection
+from src.pagination import paginate
+
+RATINGS = (1, 2, 3, 4, 5)
+
+def rating_increments(rating: int, direction: int = 1):
+    """$inc document updating a book's rating aggregates (and version) for one review"""
+    return {
+        'rating_count': direction,
+        'rating_sum': direction * rating,
+        f'rating_histogram.{rating}': direction,
+        'version': 1
+    }
 
 class ReviewService:
     def __init__(self):
         self.db = get_db()
     
-    def get_all_reviews(self):
-        """Get all reviews with user and book information"""
-        reviews = list(self.db.reviews.find().sort('created_at', -1))
+    def get_all_reviews(self, limit: int = None, after: str = None, fields: list = None):
+        """Get a page of reviews with user and book information.
+
+        When fields is given only those fields are fetched and populated.
+        """
+        populate_user = fields is None or 'user' in fields
+        populate_book = fields is None
+        required = ('created_at', 'user_uid') if populate_user else ('created_at',)
+        projection = build_projection(fields, *required)
+        reviews, next_cursor = paginate(self.db.reviews, {}, limit, after, projection)
         
-        # Populate user and book information
+        # Populate user and book information, one query per collection
+        users = self._get_review_users(reviews) if populate_user else {}
+        books = self._get_review_books(reviews) if populate_book else {}
         for review in reviews:
-            # Get user information
-            user = self.db.users.find_one({'_id': ObjectId(review['user_uid'])})
+            user = users.get(review.get('user_uid'))
             if user:
-                review['user'] = {
-                    'uid': str(user['_id']),
-                    'username': user.get('username'),
-                    'email': user.get('email'),
-                    'first_name': user.get('first_name'),
-                    'last_name': user.get('last_name')
-                }
+                review['user'] = self._format_user(user)
             
-            # Get book information
-            book = self.db.books.find_one({'_id': ObjectId(review['book_uid'])})
+            book = books.get(review.get('book_uid'))
             if book:
                 review['book'] = {
                     'uid': str(book['_id']),
@@ -32,7 +48,43 @@ class ReviewService:
                     'author': book.get('author')
                 }
         
-        return reviews
+        return reviews, next_cursor
+    
+    def _get_review_users(self, reviews):
+        """Reviewers of the given reviews, keyed by user ID"""
+        from src.auth.service import AuthService, PROFILE_FIELDS
+        return AuthService().get_users_by_ids((review.get('user_uid') for review in reviews), PROFILE_FIELDS)
+    
+    def _get_review_books(self, reviews):
+        """Books of the given reviews (title and author only), keyed by book ID"""
+        object_ids = list({ObjectId(review['book_uid']) for review in reviews if ObjectId.is_valid(review.get('book_uid') or '')})
+        if not object_ids:
+            return {}
+        books = self.db.books.find({'_id': {'$in': object_ids}}, {'title': 1, 'author': 1})
+        return {str(book['_id']): book for book in books}
+    
+    @staticmethod
+    def _format_user(user):
+        return {
+            'uid': str(user['_id']),
+            'username': user.get('username'),
+            'email': user.get('email'),
+            'first_name': user.get('first_name'),
+            'last_name': user.get('last_name')
+        }
+    
+    def get_reviews_count(self):
+        """Get the estimated number of reviews"""
+        return self.db.reviews.estimated_document_count()
+    
+    def get_reviews_version(self):
+        """Get the version of the reviews collection, bumped on every review write"""
+        return get_collection_version('reviews')
+    
+    def get_book_reviews_version(self, book_uid: str):
+        """Get a version stamp for a book's reviews (review writes bump the book's version)"""
+        from src.books.service import BookService
+        return BookService().get_book_version(book_uid)
     
     def get_review(self, review_uid: str):
         """Get a single review by ID"""
@@ -56,17 +108,12 @@ class ReviewService:
         try:
             reviews = list(self.db.reviews.find({'book_uid': book_uid}).sort('created_at', -1))
             
-            # Populate user information
+            # Populate user information with a single query
+            users = self._get_review_users(reviews)
             for review in reviews:
-                user = self.db.users.find_one({'_id': ObjectId(review['user_uid'])})
+                user = users.get(review.get('user_uid'))
                 if user:
-                    review['user'] = {
-                        'uid': str(user['_id']),
-                        'username': user.get('username'),
-                        'email': user.get('email'),
-                        'first_name': user.get('first_name'),
-                        'last_name': user.get('last_name')
-                    }
+                    review['user'] = self._format_user(user)
             
             return reviews
         except:
@@ -78,28 +125,14 @@ class ReviewService:
             # Get user by email
             from src.auth.service import AuthService
             auth_service = AuthService()
-            user = auth_service.get_user_by_email(user_email)
+            user = auth_service.get_principal(user_email)
             
             if not user:
                 return {'error': 'User not found'}, 404
             
-            # Check if book exists
-            from src.books.service import BookService
-            book_service = BookService()
-            book = book_service.get_book(book_uid)
-            
-            if not book:
+            if not ObjectId.is_valid(book_uid):
                 return {'error': 'Book not found'}, 404
             
-            # Check if user already reviewed this book
-            existing_review = self.db.reviews.find_one({
-                'user_uid': str(user['_id']),
-                'book_uid': book_uid
-            })
-            
-            if existing_review:
-                return {'error': 'You have already reviewed this book'}, 400
-            
             # Create review document
             review_doc = {
                 'rating': review_data['rating'],
@@ -110,9 +143,27 @@ class ReviewService:
                 'updated_at': datetime.utcnow()
             }
             
-            result = self.db.reviews.insert_one(review_doc)
+            # The unique (user_uid, book_uid) index rejects a second review
+            try:
+                result = self.db.reviews.insert_one(review_doc)
+            except DuplicateKeyError:
+                return {'error': 'You have already reviewed this book'}, 400
             review_doc['_id'] = result.inserted_id
             
+            # Keep the book's rating aggregates in step with its reviews; this also
+            # checks the book exists, so a review of a missing book is taken back
+            book = self.db.books.find_one_and_update(
+                {'_id': ObjectId(book_uid)},
+                {'$inc': rating_increments(review_doc['rating'])},
+                projection={'user_uid': 1}
+            )
+            if not book:
+                self.db.reviews.delete_one({'_id': review_doc['_id']})
+                return {'error': 'Book not found'}, 404
+            from src.books.service import invalidate_book_cache
+            bump_collection_version('reviews', 'books')
+            invalidate_book_cache([book_uid], [book.get('user_uid')])
+            
             return review_doc, 201
             
         except Exception as e:
@@ -124,7 +175,7 @@ class ReviewService:
             # Get user by email
             from src.auth.service import AuthService
             auth_service = AuthService()
-            user = auth_service.get_user_by_email(user_email)
+            user = auth_service.get_principal(user_email)
             
             if not user:
                 return {'error': 'User not found'}, 404
@@ -142,6 +193,14 @@ class ReviewService:
             result = self.db.reviews.delete_one({'_id': ObjectId(review_uid)})
             
             if result.deleted_count > 0:
+                from src.books.service import invalidate_book_cache
+                book = self.db.books.find_one_and_update(
+                    {'_id': ObjectId(review['book_uid'])},
+                    {'$inc': rating_increments(review['rating'], -1)},
+                    projection={'user_uid': 1}
+                )
+                bump_collection_version('reviews', 'books')
+                invalidate_book_cache([review['book_uid']], [book.get('user_uid')] if book else [])
                 return {'message': 'Review deleted successfully'}, 200
             else:
                 return {'error': 'Failed to delete review'}, 500
@@ -149,6 +208,64 @@ class ReviewService:
         except Exception as e:
             return {'error': f'Error deleting review: {str(e)}'}, 500
     
+    def reconcile_book_ratings(self, batch_size: int = 1000):
+        """Recompute every book's rating aggregates from its reviews, returns the number of books updated"""
+        group = {'_id': '$book_uid', 'rating_count': {'$sum': 1}, 'rating_sum': {'$sum': '$rating'}}
+        for rating in RATINGS:
+            group[f'stars_{rating}'] = {'$sum': {'$cond': [{'$eq': ['$rating', rating]}, 1, 0]}}
+        
+        updated = 0
+        operations = []
+        reviewed_books = set()
+        
+        def set_aggregates(book_id, aggregates):
+            # Only books whose aggregates differ are rewritten, versioned and evicted
+            return UpdateOne(
+                {'_id': book_id, '$or': [{field: {'$ne': value}} for field, value in aggregates.items()]},
+                {'$set': aggregates, '$inc': {'version': 1}}
+            )
+        
+        def flush(operations):
+            # operations holds (book ID, update) pairs
+            from src.books.service import invalidate_book_cache
+            modified = self.db.books.bulk_write([update for _, update in operations], ordered=False).modified_count
+            if modified:
+                invalidate_book_cache([str(book_id) for book_id, _ in operations])
+            return modified
+        
+        for stats in self.db.reviews.aggregate([{'$group': group}], allowDiskUse=True):
+            if not ObjectId.is_valid(stats['_id']):
+                continue
+            reviewed_books.add(stats['_id'])
+            book_id = ObjectId(stats['_id'])
+            operations.append((book_id, set_aggregates(book_id, {
+                'rating_count': stats['rating_count'],
+                'rating_sum': stats['rating_sum'],
+                'rating_histogram': {str(rating): stats[f'stars_{rating}'] for rating in RATINGS}
+            })))
+            if len(operations) >= batch_size:
+                updated += flush(operations)
+                operations = []
+        
+        # Reset books whose reviews have all gone, or that never had aggregates
+        empty = {'rating_count': 0, 'rating_sum': 0, 'rating_histogram': {str(rating): 0 for rating in RATINGS}}
+        stale = self.db.books.find(
+            {'$or': [{'rating_count': {'$ne': 0}}, {'rating_histogram': {'$exists': False}}]},
+            {'_id': 1}
+        ).batch_size(batch_size)
+        for book in stale:
+            if str(book['_id']) not in reviewed_books:
+                operations.append((book['_id'], set_aggregates(book['_id'], empty)))
+            if len(operations) >= batch_size:
+                updated += flush(operations)
+                operations = []
+        
+        if operations:
+            updated += flush(operations)
+        if updated:
+            bump_collection_version('books')
+        return updated
+    
     def user_owns_review(self, user_uid: str, review_uid: str) -> bool:
         """Check if user owns the review"""
         try:
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+
+import redis
+from bson import json_util
+
+from src import metrics
+from src.db.models import get_db, get_collection_version, bump_collection_version
+
+TAG_CHANGES_CHANNEL = 'tag_changes'
+
+# collection_versions key bumped only when tags are created or deleted (not on book_count changes)
+TAG_DICTIONARY_VERSION = 'tag_dictionary'
+
+# Tag fields kept in memory (book_count changes too often to cache)
+TAG_FIELDS = {'name': 1, 'color': 1, 'created_at': 1, 'updated_at': 1}
+
+class TagDictionary:
+    """In-process bidirectional tag ID <-> name map, loaded at startup.
+
+    Tags created or deleted in this process are applied immediately and
+    published over Redis pub/sub to the other workers; a dropped subscription
+    is re-established after TAG_CACHE_RETRY_DELAY seconds and the map reloaded.
+    As a safety net for missed messages, the dictionary's own version (bumped
+    on tag creation and deletion only) is compared every TAG_CACHE_REFRESH
+    seconds and the map reloaded when it has moved.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.refresh_interval = 60
+        self.retry_delay = 5
+        self._by_id = {}
+        self._by_name = {}
+        self._version = None
+        self._checked_at = 0
+        self._pubsub_thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, client=None):
+        self.refresh_interval = app.config['TAG_CACHE_REFRESH']
+        self.retry_delay = app.config['TAG_CACHE_RETRY_DELAY']
+        self.client = client or redis.Redis.from_url(
+            app.config['REDIS_URL'],
+            socket_timeout=app.config['CACHE_SOCKET_TIMEOUT'],
+            decode_responses=True
+        )
+        metrics.register_gauge('tag_dictionary.size', self.__len__)
+        # Subscribe before loading so no change falls between the two
+        if app.config['TAG_CACHE_PUBSUB']:
+            self._subscribe()
+        self.load()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def load(self):
+        """Replace the map with the current contents of the tags collection"""
+        version = get_collection_version(TAG_DICTIONARY_VERSION)
+        tags = list(get_db().tags.find({}, TAG_FIELDS))
+        with self._lock:
+            self._by_id = {str(tag['_id']): tag for tag in tags}
+            self._by_name = {tag['name']: str(tag['_id']) for tag in tags}
+            self._version = version
+            self._checked_at = time.monotonic()
+        metrics.incr('tag_dictionary.loads')
+
+    def _refresh_if_stale(self):
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            if get_collection_version(TAG_DICTIONARY_VERSION) != self._version:
+                self.load()
+        except Exception as e:
+            logging.warning(f"Could not refresh tag dictionary: {e}")
+
+    def _subscribe(self) -> bool:
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{TAG_CHANGES_CHANNEL: self._on_change})
+            self._pubsub_thread = pubsub.run_in_thread(
+                sleep_time=1,
+                daemon=True,
+                exception_handler=self._on_pubsub_error
+            )
+            return True
+        except redis.RedisError as e:
+            logging.warning(f"Could not subscribe to tag changes: {e}")
+            self._schedule(self.retry_delay, self._resubscribe)
+            return False
+
+    def _on_pubsub_error(self, error, pubsub, thread):
+        logging.warning(f"Tag change subscription lost: {error}")
+        metrics.incr('tag_dictionary.pubsub_errors')
+        thread.stop()
+        self._schedule(self.retry_delay, self._resubscribe)
+
+    def _resubscribe(self):
+        # Changes published while disconnected were missed, so reload after subscribing
+        if not self._subscribe():
+            return
+        try:
+            self.load()
+        except Exception as e:
+            logging.warning(f"Could not reload tag dictionary: {e}")
+            self._pubsub_thread.stop()
+            self._schedule(self.retry_delay, self._resubscribe)
+
+    def _schedule(self, delay: float, func):
+        timer = threading.Timer(delay, func)
+        timer.daemon = True
+        timer.start()
+
+    def _on_change(self, message):
+        change = json_util.loads(message['data'])
+        if change['op'] == 'add':
+            self._add(change['tag'])
+        else:
+            self._remove(change['uid'])
+
+    def _publish(self, change: dict):
+        try:
+            self.client.publish(TAG_CHANGES_CHANNEL, json_util.dumps(change))
+        except redis.RedisError as e:
+            # Other workers catch up on their next version check
+            logging.warning(f"Could not publish tag change: {e}")
+
+    def _add(self, tag: dict):
+        tag = {field: tag[field] for field in ('_id', *TAG_FIELDS) if field in tag}
+        with self._lock:
+            self._by_id[str(tag['_id'])] = tag
+            self._by_name[tag['name']] = str(tag['_id'])
+
+    def _remove(self, tag_uid: str):
+        with self._lock:
+            tag = self._by_id.pop(tag_uid, None)
+            if tag and self._by_name.get(tag['name']) == tag_uid:
+                del self._by_name[tag['name']]
+
+    def add(self, *tags):
+        """Record newly created tags here and in every other worker"""
+        if not tags:
+            return
+        bump_collection_version(TAG_DICTIONARY_VERSION)
+        for tag in tags:
+            self._add(tag)
+            self._publish({'op': 'add', 'tag': self._by_id[str(tag['_id'])]})
+
+    def remove(self, tag_uid: str):
+        """Forget a deleted tag here and in every other worker"""
+        bump_collection_version(TAG_DICTIONARY_VERSION)
+        self._remove(tag_uid)
+        self._publish({'op': 'remove', 'uid': tag_uid})
+
+    def get(self, tag_uid: str):
+        self._refresh_if_stale()
+        tag = self._by_id.get(tag_uid)
+        metrics.incr('tag_dictionary.hits' if tag else 'tag_dictionary.misses')
+        return tag
+
+    def get_by_name(self, name: str):
+        self._refresh_if_stale()
+        tag_uid = self._by_name.get(name)
+        return self.get(tag_uid) if tag_uid else None
+
+    def get_many(self, tag_uids):
+        """Cached tags for the given IDs, keyed by ID (unknown IDs are left out)"""
+        self._refresh_if_stale()
+        tags = {uid: self._by_id[uid] for uid in tag_uids if uid in self._by_id}
+        metrics.incr('tag_dictionary.hits', len(tags))
+        return tags
+
+    def ids_for_names(self, names):
+        """Cached tag IDs for the given names, keyed by name (unknown names are left out)"""
+        self._refresh_if_stale()
+        return {name: self._by_name[name] for name in names if name in self._by_name}
+
+tag_dictionary = TagDictionary()
@@ -1,10 +1,13 @@
-from flask import request
-from flask_restx import Namespace, Resource, fields
+from flask import current_app, request
+from flask_restx import Namespace, Resource, fields, marshal
 from flask_jwt_extended import jwt_required
 
 from src.tags.service import TagService
 from src.tags.schemas import TagCreateSchema, TagAddSchema, TagSchema
 from src.auth.dependencies import RoleChecker
+from src.etags import make_etag, etag_headers, not_modified
+from src.fieldsets import FIELDS_PARAM, get_fieldset
+from src.pagination import PAGINATION_PARAMS, get_pagination_args, pagination_headers
 
 # Create namespace
 tags_ns = Namespace('tags', description='Tag operations')
@@ -19,6 +22,15 @@ tag_schema = TagSchema()
 
 # Flask-RESTX models for Swagger
 tag_model = tags_ns.model('Tag', {
+    'uid': fields.String(description='Tag ID'),
+    'name': fields.String(description='Tag Name'),
+    'book_count': fields.Integer(description='Number of books with this tag'),
+    'created_at': fields.DateTime(description='Created At'),
+    'updated_at': fields.DateTime(description='Updated At')
+})
+
+# Tags of a book are hydrated from the tag dictionary, which has no book counts
+book_tag_model = tags_ns.model('BookTag', {
     'uid': fields.String(description='Tag ID'),
     'name': fields.String(description='Tag Name'),
     'created_at': fields.DateTime(description='Created At'),
@@ -54,15 +66,25 @@ def format_tag_response(tag_doc):
 # =========================
 @tags_ns.route('/')
 class TagList(Resource):
-    @tags_ns.marshal_list_with(tag_model)
+    @tags_ns.doc(params={**PAGINATION_PARAMS, 'fields': FIELDS_PARAM})
+    @tags_ns.response(200, 'Success', [tag_model])
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self):
-        """Get all tags"""
+        """Get all tags (cursor paginated)"""
+        fields, model = get_fieldset(tag_model)
+        limit, after, with_total = get_pagination_args()
         try:
-            tags = tag_service.get_all_tags()
+            etag = make_etag('tags', tag_service.get_tags_version(), request.query_string.decode())
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            tags, next_cursor = tag_service.get_all_tags(limit, after, fields)
             formatted_tags = [format_tag_response(tag) for tag in tags]
-            return formatted_tags, 200
+            total = tag_service.get_tags_count() if with_total else None
+            headers = {**pagination_headers(next_cursor, total), **etag_headers(etag)}
+            return marshal(formatted_tags, model), 200, headers
         except Exception as e:
             return {'message': f'Error fetching tags: {str(e)}'}, 500
 
@@ -90,6 +112,25 @@ class TagList(Resource):
         except Exception as e:
             return {'message': f'Error creating tag: {str(e)}'}, 500
 
+# =========================
+# Popular Tags (tag cloud)
+# =========================
+@tags_ns.route('/popular')
+class PopularTags(Resource):
+    @tags_ns.doc(params={'limit': 'Number of tags to return'})
+    @tags_ns.marshal_list_with(tag_model)
+    @jwt_required()
+    @RoleChecker(['admin', 'user'])
+    def get(self):
+        """Get the tags on the most books"""
+        limit = request.args.get('limit', current_app.config['DEFAULT_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+        try:
+            tags = tag_service.get_popular_tags(limit)
+            return [format_tag_response(tag) for tag in tags], 200
+        except Exception as e:
+            return {'message': f'Error fetching popular tags: {str(e)}'}, 500
+
 # =========================
 # Add Tags to Book & Get Book Tags
 # =========================
@@ -113,7 +154,7 @@ class BookTags(Resource):
         except Exception as e:
             return {'message': f'Error adding tags to book: {str(e)}'}, 500
 
-    @tags_ns.marshal_list_with(tag_model)
+    @tags_ns.marshal_list_with(book_tag_model)
     @jwt_required()
     @RoleChecker(['admin', 'user'])
     def get(self, book_uid):
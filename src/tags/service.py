@@ -1,31 +1,50 @@
 from bson import ObjectId
 from datetime import datetime
-from src.db.models import get_db
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.db.models import get_db, get_collection_version, bump_collection_version
+from src.fieldsets import build_projection
+from src.pagination import paginate
+from src.tags.dictionary import tag_dictionary
 
 class TagService:
     def __init__(self):
         self.db = get_db()
     
-    def get_all_tags(self):
-        """Get all tags"""
+    def get_all_tags(self, limit: int = None, after: str = None, fields: list = None):
+        """Get a page of tags, fetching only the given fields if any"""
         try:
-            tags = list(self.db.tags.find().sort('created_at', -1))
-            return tags
+            projection = build_projection(fields, 'created_at')
+            return paginate(self.db.tags, {}, limit, after, projection)
         except Exception as e:
             print(f"Error getting tags: {e}")
-            return []
+            return [], None
+    
+    def get_tags_count(self):
+        """Get the estimated number of tags"""
+        return self.db.tags.estimated_document_count()
+    
+    def get_tags_version(self):
+        """Get the version of the tags collection, bumped on every tag write"""
+        return get_collection_version('tags')
     
     def get_tag(self, tag_uid: str):
-        """Get a single tag by ID"""
+        """Get a single tag by ID (from the tag dictionary, falling back to Mongo)"""
         try:
+            tag = tag_dictionary.get(tag_uid)
+            if tag:
+                return tag
             tag = self.db.tags.find_one({'_id': ObjectId(tag_uid)})
             return tag
         except:
             return None
     
     def get_tag_by_name(self, name: str):
-        """Get tag by name"""
+        """Get tag by name (from the tag dictionary, falling back to Mongo)"""
         try:
+            tag = tag_dictionary.get_by_name(name)
+            if tag:
+                return tag
             tag = self.db.tags.find_one({'name': name})
             return tag
         except:
@@ -34,20 +53,23 @@ class TagService:
     def create_tag(self, tag_data: dict):
         """Create a new tag"""
         try:
-            # Check if tag already exists
-            existing_tag = self.get_tag_by_name(tag_data['name'])
+            # Check if tag already exists (in Mongo: the dictionary may lag behind deletes)
+            existing_tag = self.db.tags.find_one({'name': tag_data['name']}, {'_id': 1})
             if existing_tag:
                 return {'error': 'Tag already exists'}, 400
             
             # Create tag document
             tag_doc = {
                 'name': tag_data['name'],
+                'book_count': 0,
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow()
             }
             
             result = self.db.tags.insert_one(tag_doc)
             tag_doc['_id'] = result.inserted_id
+            bump_collection_version('tags')
+            tag_dictionary.add(tag_doc)
             
             return tag_doc, 201
             
@@ -55,52 +77,44 @@ class TagService:
             return {'error': f'Error creating tag: {str(e)}'}, 500
     
     def add_tags_to_book(self, book_uid: str, tags_data: dict):
-        """Add tags to a book"""
+        """Add tags to a book, creating missing tags (a constant number of queries for any number of tags)"""
         try:
             # Check if book exists
-            from src.books.service import BookService
-            book_service = BookService()
-            book = book_service.get_book(book_uid)
-            
-            if not book:
+            if not ObjectId.is_valid(book_uid) or not self.db.books.find_one({'_id': ObjectId(book_uid)}, {'_id': 1}):
                 return {'error': 'Book not found'}, 404
             
-            tag_ids = []
+            names = list(dict.fromkeys(tag_item['name'] for tag_item in tags_data['tags']))
+            tag_ids = self._upsert_tags(names)
             
-            # Process each tag in the request
-            for tag_item in tags_data['tags']:
-                tag_name = tag_item['name']
-                
-                # Find or create tag
-                existing_tag = self.get_tag_by_name(tag_name)
-                if existing_tag:
-                    tag_id = str(existing_tag['_id'])
-                else:
-                    # Create new tag
-                    new_tag, status = self.create_tag({'name': tag_name})
-                    if status == 201:
-                        tag_id = str(new_tag['_id'])
-                    else:
-                        continue  # Skip if tag creation failed
-                
-                tag_ids.append(tag_id)
-            
-            # Update book with tags (using book_tags collection for many-to-many)
-            for tag_id in tag_ids:
-                # Check if tag already associated with book
-                existing_book_tag = self.db.book_tags.find_one({
-                    'book_uid': book_uid,
-                    'tag_uid': tag_id
-                })
-                
-                if not existing_book_tag:
-                    # Create book-tag relationship
-                    book_tag_doc = {
-                        'book_uid': book_uid,
-                        'tag_uid': tag_id,
-                        'created_at': datetime.utcnow()
-                    }
-                    self.db.book_tags.insert_one(book_tag_doc)
+            # Link the tags to the book; existing links fail the unique index and are skipped
+            now = datetime.utcnow()
+            links = [
+                {'book_uid': book_uid, 'tag_uid': str(tag_ids[name]), 'created_at': now}
+                for name in names if name in tag_ids
+            ]
+            linked = links
+            if links:
+                try:
+                    self.db.book_tags.insert_many(links, ordered=False)
+                except BulkWriteError as e:
+                    if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                        raise
+                    duplicates = {error['index'] for error in e.details['writeErrors']}
+                    linked = [link for index, link in enumerate(links) if index not in duplicates]
+            
+            # Count the book on each newly linked tag
+            if linked:
+                self.db.tags.update_many(
+                    {'_id': {'$in': [ObjectId(link['tag_uid']) for link in linked]}},
+                    {'$inc': {'book_count': 1}}
+                )
+                # Book listings filtered by tag and tag book counts change with the links
+                bump_collection_version('books', 'tags')
+            
+            # Tags are part of the book detail payload
+            from src.books.service import invalidate_book_cache
+            self.db.books.update_one({'_id': ObjectId(book_uid)}, {'$inc': {'version': 1}})
+            invalidate_book_cache([book_uid])
             
             # Return success message
             return {'message': 'Tags added to book successfully'}, 200
@@ -108,20 +122,185 @@ class TagService:
         except Exception as e:
             return {'error': f'Error adding tags to book: {str(e)}'}, 500
     
+    def _upsert_tags(self, names: list):
+        """Resolve tag names to IDs, creating missing tags in one unordered bulk upsert"""
+        if not names:
+            return {}
+        
+        # Resolved in Mongo, not the tag dictionary, which may lag behind deletes in other workers
+        tag_ids = {tag['name']: tag['_id'] for tag in self.db.tags.find({'name': {'$in': names}}, {'name': 1})}
+        missing = [name for name in names if name not in tag_ids]
+        if not missing:
+            return tag_ids
+        
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'name': name},
+                {'$setOnInsert': {'name': name, 'book_count': 0, 'created_at': now, 'updated_at': now}},
+                upsert=True
+            )
+            for name in missing
+        ]
+        try:
+            upserted = self.db.tags.bulk_write(operations, ordered=False).upserted_ids
+        except BulkWriteError as e:
+            # Concurrent upserts of the same name can hit the unique index
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+            upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+        
+        for index, tag_id in upserted.items():
+            tag_ids[missing[index]] = tag_id
+        tag_dictionary.add(*[
+            {'_id': tag_id, 'name': missing[index], 'created_at': now, 'updated_at': now}
+            for index, tag_id in upserted.items()
+        ])
+        
+        # Tags created by another request in the meantime
+        unresolved = [name for name in missing if name not in tag_ids]
+        if unresolved:
+            tag_ids.update({tag['name']: tag['_id'] for tag in self.db.tags.find({'name': {'$in': unresolved}}, {'name': 1})})
+        
+        if upserted:
+            bump_collection_version('tags')
+        return tag_ids
+    
+    def get_tagged_book_page(self, names: list, match_all: bool = True, limit: int = 20, after: str = None):
+        """One page of IDs of the books carrying all (or any) of the named tags, ordered by book ID.
+
+        Tag names are resolved once. For match_all the posting list of the tag on
+        the fewest books is walked in chunks and each chunk is checked against the
+        other tags; for any the posting lists are merged in book ID order. Only
+        about one page of links is read per request. Returns (book_uids, next_cursor)
+        where next_cursor is the last book ID of the page.
+        """
+        tags = list(self.db.tags.find({'name': {'$in': names}}, {'book_count': 1}))
+        if not tags or (match_all and len(tags) < len(set(names))):
+            return [], None
+        
+        tag_uids = [str(tag['_id']) for tag in sorted(tags, key=lambda tag: tag.get('book_count', 0))]
+        book_uids = self._match_all(tag_uids, limit + 1, after) if match_all else self._match_any(tag_uids, limit + 1, after)
+        
+        # One extra ID tells whether another page exists
+        if len(book_uids) > limit:
+            return book_uids[:limit], book_uids[limit - 1]
+        return book_uids, None
+    
+    def _posting_list(self, tag_uids, after: str = None):
+        """book_tags links of the given tags in book ID order, starting after a book ID"""
+        query = {'tag_uid': tag_uids[0] if len(tag_uids) == 1 else {'$in': tag_uids}}
+        if after:
+            query['book_uid'] = {'$gt': after}
+        return self.db.book_tags.find(query, {'_id': 0, 'book_uid': 1}).sort('book_uid', 1)
+    
+    def _match_any(self, tag_uids, count: int, after: str = None):
+        book_uids = []
+        for link in self._posting_list(tag_uids, after):
+            # Links come merged in book ID order, so duplicates are adjacent
+            if not book_uids or book_uids[-1] != link['book_uid']:
+                book_uids.append(link['book_uid'])
+                if len(book_uids) >= count:
+                    break
+        return book_uids
+    
+    def _match_all(self, tag_uids, count: int, after: str = None):
+        chunk_size = max(count * 4, 100)
+        smallest, others = tag_uids[0], tag_uids[1:]
+        book_uids = []
+        while len(book_uids) < count:
+            chunk = [link['book_uid'] for link in self._posting_list([smallest], after).limit(chunk_size)]
+            if not chunk:
+                break
+            after = chunk[-1]
+            
+            candidates = set(chunk)
+            for tag_uid in others:
+                candidates = set(self.db.book_tags.distinct(
+                    'book_uid',
+                    {'tag_uid': tag_uid, 'book_uid': {'$in': list(candidates)}}
+                ))
+                if not candidates:
+                    break
+            book_uids += [book_uid for book_uid in chunk if book_uid in candidates]
+            if len(chunk) < chunk_size:
+                break
+        return book_uids[:count]
+    
+    def get_tag_book_count(self, name: str):
+        """Number of books carrying a tag"""
+        tag = self.db.tags.find_one({'name': name}, {'book_count': 1})
+        return tag.get('book_count', 0) if tag else 0
+    
+    def get_popular_tags(self, limit: int = 20):
+        """Get the tags on the most books"""
+        try:
+            return list(self.db.tags.find().sort([('book_count', -1), ('_id', -1)]).limit(limit))
+        except Exception as e:
+            print(f"Error getting popular tags: {e}")
+            return []
+    
+    def unlink_book(self, book_uid: str):
+        """Remove a (deleted) book's tag links, decrementing the tags' book counts"""
+        tag_uids = self.db.book_tags.distinct('tag_uid', {'book_uid': book_uid})
+        if not tag_uids:
+            return
+        self.db.book_tags.delete_many({'book_uid': book_uid})
+        self.db.tags.update_many(
+            {'_id': {'$in': [ObjectId(uid) for uid in tag_uids if ObjectId.is_valid(uid)]}},
+            {'$inc': {'book_count': -1}}
+        )
+        bump_collection_version('tags')
+    
+    def reconcile_book_counts(self, batch_size: int = 1000):
+        """Recompute every tag's book count from book_tags, returns the number of tags updated"""
+        updated = 0
+        operations = []
+        counted_tags = set()
+        pipeline = [{'$group': {'_id': '$tag_uid', 'book_count': {'$sum': 1}}}]
+        for stats in self.db.book_tags.aggregate(pipeline, allowDiskUse=True):
+            if not ObjectId.is_valid(stats['_id']):
+                continue
+            counted_tags.add(stats['_id'])
+            operations.append(UpdateOne({'_id': ObjectId(stats['_id'])}, {'$set': {'book_count': stats['book_count']}}))
+            if len(operations) >= batch_size:
+                updated += self.db.tags.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        
+        # Reset tags that are no longer on any book, or that never had a count
+        stale = self.db.tags.find(
+            {'$or': [{'book_count': {'$ne': 0}}, {'book_count': {'$exists': False}}]},
+            {'_id': 1}
+        ).batch_size(batch_size)
+        for tag in stale:
+            if str(tag['_id']) not in counted_tags:
+                operations.append(UpdateOne({'_id': tag['_id']}, {'$set': {'book_count': 0}}))
+            if len(operations) >= batch_size:
+                updated += self.db.tags.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        
+        if operations:
+            updated += self.db.tags.bulk_write(operations, ordered=False).modified_count
+        if updated:
+            bump_collection_version('tags')
+        return updated
+    
+    def get_tags_by_ids(self, tag_uids):
+        """Get tags for many IDs keyed by ID, in the given order (Mongo only for IDs the dictionary lacks)"""
+        tags = tag_dictionary.get_many(tag_uids)
+        unknown = [ObjectId(uid) for uid in tag_uids if uid not in tags and ObjectId.is_valid(uid)]
+        if unknown:
+            tags.update({str(tag['_id']): tag for tag in self.db.tags.find({'_id': {'$in': unknown}})})
+        return {uid: tags[uid] for uid in tag_uids if uid in tags}
+    
     def get_book_tags(self, book_uid: str):
         """Get all tags for a specific book"""
         try:
             # Get book-tag relationships
-            book_tags = list(self.db.book_tags.find({'book_uid': book_uid}))
-            
-            # Get tag details for each relationship
-            tags = []
-            for book_tag in book_tags:
-                tag = self.db.tags.find_one({'_id': ObjectId(book_tag['tag_uid'])})
-                if tag:
-                    tags.append(tag)
+            tag_uids = [link['tag_uid'] for link in self.db.book_tags.find({'book_uid': book_uid}, {'tag_uid': 1})]
             
-            return tags
+            # Tag details come from the tag dictionary
+            return list(self.get_tags_by_ids(tag_uids).values())
         except Exception as e:
             print(f"Error getting book tags: {e}")
             return []
@@ -130,15 +309,25 @@ class TagService:
         """Delete a tag"""
         try:
             # Check if tag exists
-            tag = self.get_tag(tag_uid)
+            tag = self.db.tags.find_one({'_id': ObjectId(tag_uid)}, {'_id': 1})
             if not tag:
                 return {'error': 'Tag not found'}, 404
             
             # Delete tag from tags collection
             result = self.db.tags.delete_one({'_id': ObjectId(tag_uid)})
             
-            # Also delete all book-tag relationships
+            # Also delete all book-tag relationships, invalidating the tagged books
+            book_uids = self.db.book_tags.distinct('book_uid', {'tag_uid': tag_uid})
             self.db.book_tags.delete_many({'tag_uid': tag_uid})
+            self.db.books.update_many(
+                {'_id': {'$in': [ObjectId(uid) for uid in book_uids if ObjectId.is_valid(uid)]}},
+                {'$inc': {'version': 1}}
+            )
+            bump_collection_version('tags', 'books')
+            tag_dictionary.remove(tag_uid)
+            
+            from src.books.service import invalidate_book_cache
+            invalidate_book_cache(book_uids)
             
             if result.deleted_count > 0:
                 return {'message': 'Tag deleted successfully'}, 200
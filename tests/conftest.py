@@ -0,0 +1,174 @@
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import fakeredis
+import mongomock
+import pytest
+import redis
+from passlib.hash import bcrypt
+from pymongo import MongoClient
+
+import src.db.models as models
+from src.app import create_app
+from src.auth.principals import principal_cache
+from src.books.service import BookService
+from src.reviews.service import ReviewService
+
+# MongoDB server for the tests mongomock cannot run (e.g. $lookup with let)
+MONGODB_TEST_URI = os.getenv('MONGODB_TEST_URI')
+
+PASSWORD = 'password123'
+# Cheapest bcrypt cost, so creating users does not dominate the suite
+PASSWORD_HASH = bcrypt.using(rounds=4).hash(PASSWORD)
+
+# Collection methods that cost one MongoDB round trip
+QUERY_METHODS = (
+    'find', 'find_one', 'aggregate', 'distinct', 'count_documents',
+    'find_one_and_update', 'find_one_and_delete',
+    'insert_one', 'insert_many', 'update_one', 'update_many',
+    'delete_one', 'delete_many', 'bulk_write'
+)
+
+class QueryCounter:
+    """Counts the queries sent through a CountingDatabase, per collection"""
+
+    def __init__(self):
+        self.calls = []
+
+    def reset(self):
+        self.calls = []
+
+    @property
+    def count(self):
+        return len(self.calls)
+
+    def by_collection(self):
+        counts = {}
+        for collection, _ in self.calls:
+            counts[collection] = counts.get(collection, 0) + 1
+        return counts
+
+class CountingCollection:
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in QUERY_METHODS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.calls.append((self._collection.name, name))
+            return attr(*args, **kwargs)
+        return counted
+
+class CountingDatabase:
+    """Database proxy recording every query made through its collections"""
+
+    def __init__(self, db, counter):
+        self._db = db
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counter)
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def fake_redis(monkeypatch, redis_server):
+    """Every Redis client the app creates talks to one in-memory server"""
+    def fake_from_url(cls, url, **kwargs):
+        return fakeredis.FakeRedis(server=redis_server, decode_responses=kwargs.get('decode_responses', False))
+
+    monkeypatch.setattr(redis.Redis, 'from_url', classmethod(fake_from_url))
+    # Principals cached by email must not leak between test databases
+    monkeypatch.setattr(principal_cache, '_entries', OrderedDict())
+
+@pytest.fixture
+def app(monkeypatch, fake_redis):
+    """App wired to mongomock and fakeredis"""
+    monkeypatch.setattr(models, 'MongoClient', mongomock.MongoClient)
+    app = create_app('testing')
+    yield app
+    monkeypatch.setattr(models, 'db', None)
+
+@pytest.fixture
+def command_listeners():
+    """pymongo event listeners attached to the mongo_app client"""
+    return []
+
+@pytest.fixture
+def mongo_app(monkeypatch, fake_redis, command_listeners):
+    """App wired to the MongoDB server at MONGODB_TEST_URI and fakeredis"""
+    if not MONGODB_TEST_URI:
+        pytest.skip('set MONGODB_TEST_URI to run against a MongoDB server')
+    monkeypatch.setattr(models, 'MongoClient', lambda uri: MongoClient(MONGODB_TEST_URI, event_listeners=command_listeners))
+    app = create_app('testing')
+    yield app
+    models.client.drop_database(app.config['MONGODB_DB'])
+
+@pytest.fixture
+def queries(app, monkeypatch):
+    """Query counter for everything the services read from MongoDB"""
+    counter = QueryCounter()
+    monkeypatch.setattr(models, 'db', CountingDatabase(models.db, counter))
+    return counter
+
+@pytest.fixture
+def make_user(app):
+    count = 0
+
+    def make_user(**fields):
+        nonlocal count
+        count += 1
+        user = {
+            'first_name': 'Test',
+            'last_name': f'User{count}',
+            'username': f'user{count}',
+            'email': f'user{count}@example.com',
+            'password_hash': PASSWORD_HASH,
+            'role': 'user',
+            'is_verified': True,
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            **fields
+        }
+        user['_id'] = models.db.users.insert_one(user).inserted_id
+        return user
+    return make_user
+
+@pytest.fixture
+def make_book(app):
+    count = 0
+
+    def make_book(user, **fields):
+        nonlocal count
+        count += 1
+        return BookService().create_book({
+            'title': f'Book {count}',
+            'author': 'Author',
+            'publisher': 'Publisher',
+            'published_date': '2020-01-01',
+            'page_count': 100,
+            'language': 'en',
+            **fields
+        }, str(user['_id']))
+    return make_book
+
+@pytest.fixture
+def make_review(app):
+    def make_review(user, book, rating=4):
+        with app.app_context():
+            review, status = ReviewService().add_review_to_book(
+                user['email'], str(book['_id']), {'rating': rating, 'review_text': 'Worth reading'}
+            )
+        assert status == 201, review
+        return review
+    return make_review
@@ -0,0 +1,41 @@
+import mongomock
+import pytest
+from flask_jwt_extended import create_access_token
+from pymongo.errors import OperationFailure
+
+from src.books.service import BookService
+
+@pytest.fixture
+def headers(app, make_user):
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=make_user()['email'])}"}
+
+def test_failed_detail_aggregation_is_not_reported_as_missing(app, client, headers, make_user, make_book, monkeypatch):
+    book = make_book(make_user())
+
+    def too_large(self, pipeline, **kwargs):
+        raise OperationFailure('BSONObjectTooLarge')
+    monkeypatch.setattr(mongomock.collection.Collection, 'aggregate', too_large)
+
+    response = client.get(f"/api/v1/books/{book['_id']}", headers=headers)
+
+    assert response.status_code == 500
+
+def test_invalid_book_id_is_missing(app):
+    with app.app_context():
+        assert BookService().get_book('not-an-id') is None
+
+def test_batched_review_hydration_matches_the_aggregation_shape(app, queries, make_user, make_book, make_review):
+    book = make_book(make_user())
+    reviewers = [make_user() for _ in range(5)]
+    for reviewer in reviewers:
+        make_review(reviewer, book)
+
+    with app.app_context():
+        queries.reset()
+        reviews = BookService()._load_reviews(str(book['_id']), batch_size=2)
+
+    assert {review['user'][0]['username'] for review in reviews} == {user['username'] for user in reviewers}
+    assert all(set(review['user'][0]) == {'_id', 'username'} for review in reviews)
+    # One reviews query, one users $in per batch of reviews
+    assert queries.by_collection() == {'reviews': 1, 'users': 3}
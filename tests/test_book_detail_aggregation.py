@@ -0,0 +1,22 @@
+"""Book detail aggregation tests; $lookup with let needs a MongoDB server"""
+import pytest
+
+from src.books.service import BookService
+
+@pytest.fixture
+def app(mongo_app):
+    return mongo_app
+
+@pytest.mark.parametrize('embedded', [10, 3])
+def test_detail_returns_every_review_past_the_embedded_limit(app, make_user, make_book, make_review, embedded):
+    app.config['BOOK_DETAIL_EMBEDDED_REVIEWS'] = embedded
+    book = make_book(make_user())
+    reviewers = [make_user() for _ in range(5)]
+    for reviewer in reviewers:
+        make_review(reviewer, book)
+
+    with app.app_context():
+        detail = BookService()._load_book(str(book['_id']))
+
+    assert sorted(review['user']['uid'] for review in detail['reviews']) == sorted(str(user['_id']) for user in reviewers)
+    assert {review['user']['username'] for review in detail['reviews']} == {user['username'] for user in reviewers}
@@ -0,0 +1,117 @@
+"""Benchmark of the book detail view: per-review queries vs the single aggregation.
+
+Needs a MongoDB server (mongomock does not implement $lookup with let):
+
+    MONGODB_TEST_URI=mongodb://localhost:27017 pytest -s tests/test_book_detail_benchmark.py
+"""
+import statistics
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import monitoring
+
+import src.db.models as models
+from src.books.service import BookService
+
+REVIEW_COUNTS = (0, 10, 100, 500)
+RUNS = 5
+
+class CommandCounter(monitoring.CommandListener):
+    """Records the name of every command sent to the server"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+@pytest.fixture
+def commands():
+    return CommandCounter()
+
+@pytest.fixture
+def command_listeners(commands):
+    return [commands]
+
+def legacy_get_book(db, book_uid: str):
+    """get_book as it was before the aggregation: one query per review and per tag"""
+    book = db.books.find_one({'_id': ObjectId(book_uid)})
+    if not book:
+        return None
+
+    user = db.users.find_one({'_id': ObjectId(book['user_uid'])})
+    if user:
+        book['user'] = {'uid': str(user['_id']), 'username': user.get('username'), 'email': user.get('email')}
+
+    book['reviews'] = []
+    for review in db.reviews.find({'book_uid': book_uid}):
+        review_user = db.users.find_one({'_id': ObjectId(review['user_uid'])})
+        book['reviews'].append({
+            'uid': str(review['_id']),
+            'rating': review.get('rating'),
+            'comment': review.get('comment'),
+            'user': {'uid': str(review_user['_id']), 'username': review_user.get('username')} if review_user else None,
+            'created_at': review.get('created_at')
+        })
+
+    book['tags'] = []
+    for book_tag in db.book_tags.find({'book_uid': book_uid}):
+        tag = db.tags.find_one({'_id': ObjectId(book_tag['tag_uid'])})
+        if tag:
+            book['tags'].append({'uid': str(tag['_id']), 'name': tag.get('name'), 'color': tag.get('color')})
+    return book
+
+def seed_book(db, review_count: int):
+    """A book with review_count reviews, each by a different user"""
+    now = datetime.utcnow()
+    users = [
+        {'username': f'reader{review_count}-{index}', 'email': f'reader{review_count}-{index}@example.com', 'created_at': now}
+        for index in range(review_count + 1)
+    ]
+    db.users.insert_many(users)
+    owner, reviewers = users[0], users[1:]
+    book_id = db.books.insert_one({'title': 'Benchmark', 'user_uid': str(owner['_id']), 'created_at': now}).inserted_id
+    if reviewers:
+        db.reviews.insert_many([
+            {'book_uid': str(book_id), 'user_uid': str(user['_id']), 'rating': 4, 'comment': 'Good', 'created_at': now}
+            for user in reviewers
+        ])
+    return str(book_id)
+
+def measure(func, commands):
+    """Median wall time in ms over RUNS calls, and the commands sent by one call"""
+    timings = []
+    for _ in range(RUNS):
+        commands.commands = []
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), list(commands.commands), result
+
+def test_book_detail_round_trips(mongo_app, commands):
+    print(f"\n{'reviews':>8} {'legacy ms':>10} {'legacy queries':>15} {'pipeline ms':>12} {'pipeline queries':>17}")
+    with mongo_app.app_context():
+        service = BookService()
+        for review_count in REVIEW_COUNTS:
+            book_uid = seed_book(models.db, review_count)
+
+            legacy_ms, legacy_commands, legacy = measure(lambda: legacy_get_book(models.db, book_uid), commands)
+            # _load_book skips the Redis cache so every run hits MongoDB
+            pipeline_ms, pipeline_commands, book = measure(lambda: service._load_book(book_uid), commands)
+            print(f'{review_count:>8} {legacy_ms:>10.1f} {len(legacy_commands):>15} {pipeline_ms:>12.1f} {len(pipeline_commands):>17}')
+
+            assert book['user'] == legacy['user']
+            assert {r['uid']: r['user'] for r in book['reviews']} == {r['uid']: r['user'] for r in legacy['reviews']}
+            # One round trip whatever the number of reviews, against 4 + N before
+            assert pipeline_commands == ['aggregate']
+            assert len(legacy_commands) >= review_count + 4
+            if review_count == max(REVIEW_COUNTS):
+                assert pipeline_ms < legacy_ms
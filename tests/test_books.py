@@ -0,0 +1,57 @@
+import pytest
+
+from src.auth.service import AuthService
+from src.books.service import BookService
+
+def seed_books(make_user, make_book, count):
+    """count books spread over count owners (the worst case for owner lookups)"""
+    for _ in range(count):
+        make_book(make_user())
+
+def count_list_queries(app, queries, limit):
+    with app.app_context():
+        queries.reset()
+        books, _ = BookService().get_all_books(limit=limit)
+    return queries.count, books
+
+@pytest.mark.parametrize('count', [5, 50])
+def test_get_all_books_query_count_is_flat(app, queries, make_user, make_book, count):
+    seed_books(make_user, make_book, count)
+
+    query_count, books = count_list_queries(app, queries, limit=count)
+
+    assert len(books) == count
+    # One page query plus one batched owner lookup, whatever the page size
+    assert query_count == 2
+    assert queries.by_collection() == {'books': 1, 'users': 1}
+
+def test_get_all_books_populates_owner_profile_only(app, make_user, make_book):
+    owner = make_user(first_name='Ada', last_name='Lovelace')
+    make_book(owner)
+
+    with app.app_context():
+        books, _ = BookService().get_all_books()
+
+    assert books[0]['user'] == {
+        'uid': str(owner['_id']),
+        'username': owner['username'],
+        'email': owner['email'],
+        'first_name': 'Ada',
+        'last_name': 'Lovelace'
+    }
+
+def test_get_all_books_fetches_owners_without_password_hash(app, make_user, make_book, monkeypatch):
+    make_book(make_user())
+    fetched = []
+    get_users_by_ids = AuthService.get_users_by_ids
+
+    def spy(self, user_ids, fields=None):
+        users = get_users_by_ids(self, user_ids, fields)
+        fetched.extend(users.values())
+        return users
+    monkeypatch.setattr(AuthService, 'get_users_by_ids', spy)
+
+    with app.app_context():
+        BookService().get_all_books()
+
+    assert fetched and all('password_hash' not in user for user in fetched)
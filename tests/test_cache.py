@@ -0,0 +1,206 @@
+import pytest
+from bson import ObjectId
+
+from src import metrics
+from src.auth.service import AuthService
+from src.books.service import BookService, book_cache_key, user_books_cache_key
+from src.extensions import cache
+from src.reviews.service import ReviewService
+from src.tags.service import TagService
+
+@pytest.fixture
+def book_loads(monkeypatch):
+    """Record detail loads; the real $lookup pipeline needs a MongoDB server"""
+    loads = []
+
+    def load_book(self, book_uid):
+        loads.append(book_uid)
+        return self.db.books.find_one({'_id': ObjectId(book_uid)})
+    monkeypatch.setattr(BookService, '_load_book', load_book)
+    return loads
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+@pytest.fixture
+def owner(make_user):
+    return make_user()
+
+@pytest.fixture
+def book(owner, make_book):
+    return make_book(owner)
+
+def cached(key):
+    return cache.client.exists(key) == 1
+
+def warm(book):
+    """Cache the book's details and its owner's first page of books"""
+    BookService().get_book(str(book['_id']))
+    BookService().get_user_books(book['user_uid'])
+    assert cached(book_cache_key(str(book['_id'])))
+    assert cached(user_books_cache_key(book['user_uid']))
+
+# =========================
+# Hits, misses and expiry
+# =========================
+
+def test_get_book_misses_then_hits(ctx, book, book_loads):
+    hits, misses = metrics.get_counter('cache.hits'), metrics.get_counter('cache.misses')
+
+    first = BookService().get_book(str(book['_id']))
+    second = BookService().get_book(str(book['_id']))
+
+    assert first['title'] == second['title'] == book['title']
+    assert book_loads == [str(book['_id'])]
+    assert metrics.get_counter('cache.misses') == misses + 1
+    assert metrics.get_counter('cache.hits') == hits + 1
+
+def test_get_book_entries_expire(app, ctx, book, book_loads):
+    BookService().get_book(str(book['_id']))
+
+    assert 0 < cache.client.ttl(book_cache_key(str(book['_id']))) <= app.config['BOOK_CACHE_TTL']
+
+def test_get_book_does_not_cache_missing_books(ctx, book_loads):
+    book_uid = str(ObjectId())
+
+    assert BookService().get_book(book_uid) is None
+    assert BookService().get_book(book_uid) is None
+    assert book_loads == [book_uid, book_uid]
+    assert not cached(book_cache_key(book_uid))
+
+def test_get_user_books_misses_then_hits(ctx, queries, owner, make_book):
+    make_book(owner)
+    make_book(owner)
+    queries.reset()
+
+    first, _ = BookService().get_user_books(str(owner['_id']))
+    second, _ = BookService().get_user_books(str(owner['_id']))
+
+    assert [b['_id'] for b in first] == [b['_id'] for b in second]
+    assert queries.by_collection() == {'books': 1}
+
+def test_get_user_books_caches_each_page(app, ctx, queries, owner, make_book):
+    for _ in range(3):
+        make_book(owner)
+    user_uid = str(owner['_id'])
+
+    page, cursor = BookService().get_user_books(user_uid, limit=2)
+    BookService().get_user_books(user_uid, limit=2, after=cursor)
+    queries.reset()
+    BookService().get_user_books(user_uid, limit=2)
+    BookService().get_user_books(user_uid, limit=2, after=cursor)
+
+    assert queries.count == 0
+    assert cache.client.hlen(user_books_cache_key(user_uid)) == 2
+    assert 0 < cache.client.ttl(user_books_cache_key(user_uid)) <= app.config['USER_BOOKS_CACHE_TTL']
+
+def test_caching_later_pages_does_not_extend_earlier_ones(ctx, owner, make_book):
+    for _ in range(3):
+        make_book(owner)
+    user_uid = str(owner['_id'])
+    key = user_books_cache_key(user_uid)
+
+    _, cursor = BookService().get_user_books(user_uid, limit=2)
+    cache.client.expire(key, 5)
+    BookService().get_user_books(user_uid, limit=2, after=cursor)
+
+    assert cache.client.hlen(key) == 2
+    assert cache.client.ttl(key) <= 5
+
+def test_creating_a_book_evicts_the_owners_pages(ctx, owner, make_book):
+    make_book(owner)
+    BookService().get_user_books(str(owner['_id']))
+    evictions = metrics.get_counter('cache.evictions')
+
+    make_book(owner)
+
+    assert not cached(user_books_cache_key(str(owner['_id'])))
+    assert metrics.get_counter('cache.evictions') > evictions
+    books, _ = BookService().get_user_books(str(owner['_id']))
+    assert len(books) == 2
+
+# =========================
+# Invalidation triggers
+# =========================
+
+def test_update_book_evicts_and_reloads(ctx, book, book_loads):
+    warm(book)
+
+    updated = BookService().update_book(str(book['_id']), {'title': 'New title'})
+
+    assert updated['title'] == 'New title'
+    assert len(book_loads) == 2
+    assert BookService().get_book(str(book['_id']))['title'] == 'New title'
+    assert not cached(user_books_cache_key(book['user_uid']))
+
+def test_delete_book_evicts(ctx, book, book_loads):
+    warm(book)
+
+    assert BookService().delete_book(str(book['_id']))
+
+    assert not cached(book_cache_key(str(book['_id'])))
+    assert not cached(user_books_cache_key(book['user_uid']))
+
+def test_add_review_evicts(ctx, book, book_loads, make_user):
+    reviewer = make_user()
+    warm(book)
+
+    _, status = ReviewService().add_review_to_book(reviewer['email'], str(book['_id']), {'rating': 5, 'review_text': 'Great'})
+
+    assert status == 201
+    assert not cached(book_cache_key(str(book['_id'])))
+    assert not cached(user_books_cache_key(book['user_uid']))
+
+def test_delete_review_evicts(ctx, book, book_loads, make_user, make_review):
+    reviewer = make_user()
+    review = make_review(reviewer, book)
+    warm(book)
+
+    _, status = ReviewService().delete_review(str(review['_id']), reviewer['email'])
+
+    assert status == 200
+    assert not cached(book_cache_key(str(book['_id'])))
+    assert not cached(user_books_cache_key(book['user_uid']))
+
+def test_add_tags_to_book_evicts(ctx, book, book_loads):
+    # Existing tag: creating new ones goes through bulk_write, which mongomock lacks
+    TagService().create_tag({'name': 'fiction'})
+    warm(book)
+
+    _, status = TagService().add_tags_to_book(str(book['_id']), {'tags': [{'name': 'fiction'}]})
+
+    assert status == 200
+    assert not cached(book_cache_key(str(book['_id'])))
+
+def test_delete_tag_evicts_tagged_books(ctx, book, book_loads, owner, make_book):
+    untagged = make_book(owner)
+    tag, _ = TagService().create_tag({'name': 'fiction'})
+    TagService().add_tags_to_book(str(book['_id']), {'tags': [{'name': 'fiction'}]})
+    warm(book)
+    BookService().get_book(str(untagged['_id']))
+
+    _, status = TagService().delete_tag(str(tag['_id']))
+
+    assert status == 200
+    assert not cached(book_cache_key(str(book['_id'])))
+    assert cached(book_cache_key(str(untagged['_id'])))
+
+def test_profile_update_evicts_owned_and_reviewed_books(ctx, owner, book, book_loads, make_user, make_book, make_review):
+    reviewed = make_book(make_user())
+    make_review(owner, reviewed)
+    warm(book)
+    BookService().get_book(str(reviewed['_id']))
+
+    assert AuthService().update_user(str(owner['_id']), {'first_name': 'Renamed'})
+
+    assert not cached(book_cache_key(str(book['_id'])))
+    assert not cached(book_cache_key(str(reviewed['_id'])))
+
+def test_non_profile_update_keeps_books_cached(ctx, owner, book, book_loads):
+    warm(book)
+
+    assert AuthService().update_user(str(owner['_id']), {'is_verified': False})
+
+    assert cached(book_cache_key(str(book['_id'])))
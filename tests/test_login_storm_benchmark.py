@@ -0,0 +1,99 @@
+"""Benchmark of GET latency while a storm of logins runs bcrypt.
+
+Slow, so opt-in:
+
+    RUN_BENCHMARKS=1 pytest -s tests/test_login_storm_benchmark.py
+"""
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+
+import pytest
+from flask_jwt_extended import create_access_token
+from passlib.hash import bcrypt
+
+from src.auth.password_pool import password_pool
+from src.auth.throttle import login_throttle
+
+STORM_PASSWORD = 'storm-password'
+STORM_THREADS = 16
+GET_REQUESTS = 50
+# Production cost, so each login is CPU-heavy
+BCRYPT_COST = 12
+
+pytestmark = pytest.mark.skipif(not os.getenv('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run benchmarks')
+
+@pytest.fixture(scope='module')
+def storm_hash():
+    return bcrypt.using(rounds=BCRYPT_COST).hash(STORM_PASSWORD)
+
+@pytest.fixture
+def reader_headers(app, make_user, make_book):
+    """Auth headers of a user whose GETs are timed (with a page of books to list)"""
+    reader = make_user()
+    for _ in range(20):
+        make_book(reader)
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity=reader['email'])}"}
+
+@pytest.fixture
+def storm_emails(monkeypatch, make_user, storm_hash):
+    # Every storm request should reach bcrypt rather than the throttle
+    monkeypatch.setattr(login_throttle, 'enabled', False)
+    return [make_user(password_hash=storm_hash)['email'] for _ in range(STORM_THREADS)]
+
+def get_latencies(app, headers):
+    client = app.test_client()
+    latencies = []
+    for _ in range(GET_REQUESTS):
+        start = time.perf_counter()
+        response = client.get('/api/v1/books/', headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return latencies
+
+def during_login_storm(app, emails, func):
+    """Run func while STORM_THREADS clients log in back to back, returns (result, login statuses)"""
+    stop = threading.Event()
+    statuses = Counter()
+
+    def storm(email):
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post('/api/v1/auth/login', json={'email': email, 'password': STORM_PASSWORD})
+            statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=storm, args=(email,), daemon=True) for email in emails]
+    for thread in threads:
+        thread.start()
+    # Let every storm client get a login in flight
+    time.sleep(0.5)
+    try:
+        return func(), statuses
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def summary(latencies):
+    return statistics.median(latencies), statistics.quantiles(latencies, n=20)[18]
+
+def test_get_latency_during_login_storm(app, reader_headers, storm_emails, monkeypatch):
+    def measure():
+        return summary(get_latencies(app, reader_headers))
+
+    idle = measure()
+    pooled, pooled_statuses = during_login_storm(app, storm_emails, measure)
+    monkeypatch.setattr(password_pool, 'enabled', False)
+    inline, inline_statuses = during_login_storm(app, storm_emails, measure)
+
+    print(f"\n{'GET /api/v1/books/':<24} {'p50 ms':>8} {'p95 ms':>8}  logins")
+    print(f"{'idle':<24} {idle[0]:>8.1f} {idle[1]:>8.1f}")
+    print(f"{'storm, password pool':<24} {pooled[0]:>8.1f} {pooled[1]:>8.1f}  {dict(pooled_statuses)}")
+    print(f"{'storm, inline bcrypt':<24} {inline[0]:>8.1f} {inline[1]:>8.1f}  {dict(inline_statuses)}")
+
+    assert pooled_statuses[200] > 0
+    # At most PASSWORD_POOL_SIZE hashes compete with the GETs instead of one per storm client
+    assert pooled[1] < inline[1]
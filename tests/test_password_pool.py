@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from src import metrics
+from src.auth.password_pool import password_pool
+from src.errors import PasswordPoolBusy
+
+def wait_until_idle(timeout=5):
+    deadline = time.monotonic() + timeout
+    while password_pool._in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return password_pool._in_flight
+
+def test_login_gets_503_when_password_work_times_out(app, client, make_user, monkeypatch):
+    user = make_user()
+    monkeypatch.setattr(password_pool, 'timeout', 0)
+
+    response = client.post('/api/v1/auth/login', json={'email': user['email'], 'password': 'password123'})
+
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+
+def test_timed_out_jobs_keep_their_slot_until_they_leave_the_pool(app, monkeypatch):
+    assert wait_until_idle() == 0
+    monkeypatch.setattr(password_pool, 'timeout', 0.05)
+    timeouts = metrics.get_counter('password_pool.timeouts')
+
+    with pytest.raises(PasswordPoolBusy):
+        password_pool.run(time.sleep, 0.5)
+
+    assert metrics.get_counter('password_pool.timeouts') == timeouts + 1
+    # Still running in a worker process, so still counted against the bound
+    assert password_pool._in_flight == 1
+    assert wait_until_idle() == 0
@@ -0,0 +1,99 @@
+import pytest
+from bson import ObjectId
+
+from src.auth.service import AuthService
+from src.db.models import bump_collection_version, get_collection_version
+from src.reviews.service import ReviewService
+
+def seed_reviews(make_user, make_book, make_review, count):
+    """count reviews, each by a different user on a different book"""
+    for _ in range(count):
+        make_review(make_user(), make_book(make_user()))
+
+@pytest.mark.parametrize('count', [5, 50])
+def test_get_all_reviews_query_count_is_flat(app, queries, make_user, make_book, make_review, count):
+    seed_reviews(make_user, make_book, make_review, count)
+
+    with app.app_context():
+        queries.reset()
+        reviews, _ = ReviewService().get_all_reviews(limit=count)
+
+    assert len(reviews) == count
+    assert all(review['user'] and review['book'] for review in reviews)
+    # Page, reviewers and books: one query each
+    assert queries.count <= 3
+    assert queries.by_collection() == {'reviews': 1, 'users': 1, 'books': 1}
+
+@pytest.mark.parametrize('count', [5, 50])
+def test_get_book_reviews_query_count_is_flat(app, queries, make_user, make_book, make_review, count):
+    book = make_book(make_user())
+    for _ in range(count):
+        make_review(make_user(), book)
+
+    with app.app_context():
+        queries.reset()
+        reviews = ReviewService().get_book_reviews(str(book['_id']))
+
+    assert len(reviews) == count
+    assert all(review['user'] for review in reviews)
+    assert queries.count <= 3
+    assert queries.by_collection() == {'reviews': 1, 'users': 1}
+
+def test_get_all_reviews_keeps_output_shape(app, make_user, make_book, make_review):
+    reviewer = make_user(first_name='Grace', last_name='Hopper')
+    book = make_book(make_user(), title='Compilers', author='Aho')
+    make_review(reviewer, book, rating=5)
+
+    with app.app_context():
+        reviews, _ = ReviewService().get_all_reviews()
+
+    assert reviews[0]['user'] == {
+        'uid': str(reviewer['_id']),
+        'username': reviewer['username'],
+        'email': reviewer['email'],
+        'first_name': 'Grace',
+        'last_name': 'Hopper'
+    }
+    assert reviews[0]['book'] == {'uid': str(book['_id']), 'title': 'Compilers', 'author': 'Aho'}
+
+@pytest.mark.parametrize('count', [0, 50])
+def test_add_review_costs_three_round_trips(app, queries, make_user, make_book, make_review, count):
+    book = make_book(make_user())
+    for _ in range(count):
+        make_review(make_user(), book)
+    reviewer = make_user()
+
+    with app.app_context():
+        # Principals come from the in-process cache on the hot path, and the
+        # version documents exist on any database that has seen a write
+        AuthService().get_principal(reviewer['email'])
+        bump_collection_version('reviews', 'books')
+        queries.reset()
+        review, status = ReviewService().add_review_to_book(
+            reviewer['email'], str(book['_id']), {'rating': 5, 'review_text': 'Great'}
+        )
+
+    assert status == 201
+    # Insert, rating $inc and one update for both collection versions
+    assert queries.count == 3
+    assert queries.by_collection() == {'reviews': 1, 'books': 1, 'collection_versions': 1}
+
+def test_add_review_to_missing_book_leaves_no_review(app, make_user):
+    reviewer = make_user()
+
+    with app.app_context():
+        _, status = ReviewService().add_review_to_book(
+            reviewer['email'], str(ObjectId()), {'rating': 5, 'review_text': 'Great'}
+        )
+        reviews, _ = ReviewService().get_all_reviews()
+
+    assert status == 404
+    assert reviews == []
+
+def test_bump_collection_version_creates_missing_versions(app):
+    with app.app_context():
+        bump_collection_version('reviews')
+        bump_collection_version('reviews', 'books')
+
+        assert get_collection_version('reviews') == 2
+        assert get_collection_version('books') == 1
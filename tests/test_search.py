@@ -0,0 +1,36 @@
+"""Prefix search needs a MongoDB server: mongomock lacks $all with regexes and $setIntersection"""
+import pytest
+
+from src.books.service import BookService
+
+@pytest.fixture
+def app(mongo_app):
+    return mongo_app
+
+def search(app, query, limit=10, offset=0):
+    with app.app_context():
+        return BookService().search_books(query, limit, offset, prefix=True)
+
+def test_prefix_search_ranks_whole_words_and_title_matches_first(app, make_user, make_book):
+    owner = make_user()
+    make_book(owner, title='Zebra Stories', author='Dunes Walker')
+    make_book(owner, title='Duneland', author='Someone')
+    make_book(owner, title='Dune', author='Frank Herbert')
+
+    books, next_offset = search(app, 'dune')
+
+    # Whole word "dune" first, then a title word starting with it, then an author match
+    assert [book['title'] for book in books] == ['Dune', 'Duneland', 'Zebra Stories']
+    assert next_offset is None
+    assert all('_prefix_score' not in book for book in books)
+
+def test_prefix_search_pages_by_offset(app, make_user, make_book):
+    owner = make_user()
+    for index in range(5):
+        make_book(owner, title=f'Dune {index}')
+
+    first, next_offset = search(app, 'dun', limit=3)
+    second, last_offset = search(app, 'dun', limit=3, offset=next_offset)
+
+    assert next_offset == 3 and last_offset is None
+    assert [book['title'] for book in first + second] == [f'Dune {index}' for index in range(5)]
@@ -0,0 +1,122 @@
+"""Throughput of the Celery email worker against a local aiosmtpd server.
+
+Compares a fresh SMTP session per message (the old send_email) with the
+pooled sessions and with send_email_batch. Opt-in:
+
+    RUN_BENCHMARKS=1 pytest -s tests/test_smtp_throughput_benchmark.py
+"""
+import os
+import smtplib
+import socket
+import time
+
+import pytest
+
+import celery_tasks
+
+pytestmark = pytest.mark.skipif(not os.getenv('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run benchmarks')
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+aiosmtpd_smtp = pytest.importorskip('aiosmtpd.smtp')
+
+MESSAGES = 200
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 Message accepted'
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    valid = (
+        isinstance(auth_data, aiosmtpd_smtp.LoginPassword)
+        and auth_data.login.decode() == USERNAME
+        and auth_data.password.decode() == PASSWORD
+    )
+    return aiosmtpd_smtp.AuthResult(success=valid)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = CountingHandler()
+    controller = aiosmtpd_controller.Controller(
+        handler,
+        hostname='127.0.0.1',
+        port=free_port(),
+        authenticator=authenticate,
+        auth_require_tls=False
+    )
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+@pytest.fixture
+def mail_config(smtp_server):
+    controller, _ = smtp_server
+    return {
+        **celery_tasks.get_mail_config(),
+        'MAIL_SERVER': controller.hostname,
+        'MAIL_PORT': controller.port,
+        'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': USERNAME,
+        'MAIL_PASSWORD': PASSWORD,
+        'MAIL_DEFAULT_SENDER': 'noreply@example.com'
+    }
+
+def messages():
+    return [
+        {'recipients': [f'reader{index}@example.com'], 'subject': 'Verify your account', 'html_body': '<p>Welcome</p>'}
+        for index in range(MESSAGES)
+    ]
+
+def send_per_connection(mail_config):
+    """The old send_email: connect, log in, send and quit for every message"""
+    for message in messages():
+        server = smtplib.SMTP(mail_config['MAIL_SERVER'], mail_config['MAIL_PORT'], timeout=mail_config['SMTP_TIMEOUT'])
+        server.login(mail_config['MAIL_USERNAME'], mail_config['MAIL_PASSWORD'])
+        server.send_message(celery_tasks.build_message(mail_config, **message))
+        server.quit()
+
+def send_pooled(mail_config):
+    pool = celery_tasks.SMTPConnectionPool(mail_config)
+    for message in messages():
+        pool.send(celery_tasks.build_message(mail_config, **message))
+    pool.close_all()
+
+def send_batch(mail_config, monkeypatch):
+    pool = celery_tasks.SMTPConnectionPool(mail_config)
+    monkeypatch.setattr(celery_tasks, 'get_smtp_pool', lambda: pool)
+    results = celery_tasks.send_email_batch(messages())
+    pool.close_all()
+    assert all(result['status'] == 'success' for result in results)
+
+def throughput(func, handler):
+    received = handler.received
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    assert handler.received - received == MESSAGES
+    return MESSAGES / elapsed
+
+def test_smtp_throughput(smtp_server, mail_config, monkeypatch):
+    _, handler = smtp_server
+
+    per_connection = throughput(lambda: send_per_connection(mail_config), handler)
+    pooled = throughput(lambda: send_pooled(mail_config), handler)
+    batched = throughput(lambda: send_batch(mail_config, monkeypatch), handler)
+
+    print(f"\n{'mode':<16} {'messages/s':>10}")
+    print(f"{'per connection':<16} {per_connection:>10.0f}")
+    print(f"{'pooled':<16} {pooled:>10.0f}")
+    print(f"{'batch task':<16} {batched:>10.0f}")
+
+    assert pooled > per_connection
+    assert batched > per_connection
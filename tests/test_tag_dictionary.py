@@ -0,0 +1,49 @@
+import time
+from datetime import datetime
+
+import src.db.models as models
+from src.db.models import get_collection_version
+from src.tags.dictionary import TAG_DICTIONARY_VERSION, tag_dictionary
+from src.tags.service import TagService
+
+def test_book_count_changes_keep_the_dictionary_version(app, make_user, make_book):
+    book = make_book(make_user())
+    with app.app_context():
+        TagService().create_tag({'name': 'fiction'})
+        version = get_collection_version(TAG_DICTIONARY_VERSION)
+
+        TagService().add_tags_to_book(str(book['_id']), {'tags': [{'name': 'fiction'}]})
+        TagService().unlink_book(str(book['_id']))
+
+        assert get_collection_version(TAG_DICTIONARY_VERSION) == version
+
+def test_creating_and_deleting_tags_bump_the_dictionary_version(app):
+    with app.app_context():
+        version = get_collection_version(TAG_DICTIONARY_VERSION)
+        tag, _ = TagService().create_tag({'name': 'fiction'})
+        assert get_collection_version(TAG_DICTIONARY_VERSION) == version + 1
+
+        TagService().delete_tag(str(tag['_id']))
+        assert get_collection_version(TAG_DICTIONARY_VERSION) == version + 2
+
+class StoppedThread:
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+def test_lost_subscription_resubscribes_and_reloads(app, monkeypatch):
+    monkeypatch.setattr(tag_dictionary, 'retry_delay', 0)
+    # Created by another worker while this one was disconnected
+    tag_id = models.db.tags.insert_one({'name': 'missed', 'book_count': 0, 'created_at': datetime.utcnow()}).inserted_id
+    thread = StoppedThread()
+
+    tag_dictionary._on_pubsub_error(ConnectionError('connection lost'), None, thread)
+
+    deadline = time.monotonic() + 5
+    while tag_dictionary.ids_for_names(['missed']) == {} and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert thread.stopped
+    assert tag_dictionary.ids_for_names(['missed']) == {'missed': str(tag_id)}
+    tag_dictionary._pubsub_thread.stop()
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+import src.auth.throttle as throttle
+from src.auth.throttle import THROTTLE_KEY_PREFIX, login_throttle
+
+EMAIL = 'reader@example.com'
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    """Frozen clock driving both the local buckets and the Redis windows"""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(throttle, 'time', SimpleNamespace(time=lambda: clock.now, monotonic=lambda: clock.now))
+    monkeypatch.setattr(login_throttle, '_buckets', OrderedDict())
+    return clock
+
+def attempt(ip='10.0.0.1'):
+    return login_throttle.check(ip, EMAIL)
+
+def window_size():
+    return login_throttle.client.zcard(f'{THROTTLE_KEY_PREFIX}email:{EMAIL}')
+
+def test_rejected_attempts_are_not_recorded(clock):
+    limit = login_throttle.limits['email']
+    assert [attempt() for _ in range(limit)] == [0] * limit
+
+    assert attempt() > 0
+    assert attempt() > 0
+    assert window_size() == limit
+
+def test_waiting_retry_after_lets_the_client_in(clock):
+    limit, window = login_throttle.limits['email'], login_throttle.window
+    for _ in range(limit):
+        attempt()
+
+    # The local bucket has refilled a token, but the Redis window still holds every attempt
+    clock.now += window / limit
+    retry_after = attempt(ip='10.0.0.2')
+    assert retry_after == window - window // limit
+
+    clock.now += retry_after
+    assert attempt(ip='10.0.0.3') == 0
+
+def test_retry_after_is_the_longer_of_local_and_redis_waits(clock):
+    limit, window = login_throttle.limits['email'], login_throttle.window
+    for _ in range(limit):
+        attempt()
+
+    clock.now += 1
+    # The local bucket alone would answer about window / limit seconds
+    assert attempt(ip='10.0.0.2') == window - 1